@@ -0,0 +1,143 @@
+"""
+Streamlit caching of the pages of the application.
+
+Every widget interaction reruns the script of the page from the top. The PNG
+figures of the monitors are kept in the Streamlit data cache (`st.cache_data`,
+shared by all the sessions) for the ttl of their product, so a rerun caused by
+an unrelated widget reads them from memory and does not touch the network, the
+data stores or matplotlib.
+The process-wide objects (the background poller) are kept in the resource
+cache (`st.cache_resource`).
+
+The Refresh button of a monitor clears only the cached figures of its product
+and revalidates its files with the server (see `refresh`).
+
+The feeds of the sidebar panels are downloaded concurrently by worker threads,
+which cannot use the Streamlit cache; they are read from the process-wide
+response cache instead (see `feeds`).
+
+The data and plot modules of a monitor are imported the first time one of its
+figures is drawn, so the pages that do not show it never pay for their imports.
+"""
+
+import contextlib
+from collections import OrderedDict
+
+import streamlit as st
+from packages import fetch, figures, registry
+from streamlit.logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+
+@st.cache_resource(show_spinner=False)
+def start_poller():
+    """
+    Starts the background poller once for all the sessions.
+    """
+    from packages import poller
+    return poller.start_default()
+
+
+@contextlib.contextmanager
+def refresh(clicked, *functions):
+    """
+    If a Refresh button was clicked, clears the cached entries of the functions
+    and, within this context, revalidates the cached files with the server.
+    """
+    if not clicked:
+        yield
+        return
+    for function in functions:
+        function.clear()
+    with fetch.revalidate():
+        yield
+
+
+def _goes_result(module, option, time_range):
+    """
+    Returns the result of a GOES monitor for a mode, and the key of its figure
+    (None, None if there are no data). The custom ranges are read from the local archive.
+    """
+    if time_range is None:
+        result = module.store.get(option)
+        return module._decimate(result), (option, figures.data_version(result[0]))
+    result = module.query_range(*time_range)
+    if len(result[0]) == 0:
+        return None, None
+    return module._decimate(result), (option, time_range, figures.data_version(result[0]))
+
+
+def _flares(module):
+    """
+    Returns the flares of the live SXR flux. If the live feed is down, e.g. when
+    a custom range is read from the archive, returns the flares found so far
+    (none in a new process) and the figure is drawn without them.
+    """
+    try:
+        return module.detect_flares()
+    except Exception as error:
+        LOGGER.warning('Finding the flares failed: %s', error)
+        return module.detector.flares()
+
+
+@st.cache_data(ttl=registry.get('goes_sxr').ttl, show_spinner=False)
+def goes_sxr_png(option, plot_flares, time_range=None):
+    """
+    Returns the PNG figure of the GOES SXR monitor, None if there are no data.
+    """
+    from packages.noaa_goes import goes_sxr_json
+
+    result, key = _goes_result(goes_sxr_json, option, time_range)
+    if result is None:
+        return None
+    # The flares are found in the flux of the store, without another download
+    flares = _flares(goes_sxr_json) if plot_flares else None
+    template = figures.template(('goes_sxr', option, plot_flares), goes_sxr_json.figure_template)
+    return figures.cached_template_png(('goes_sxr', plot_flares, goes_sxr_json.flares_version(flares)) + key,
+                                       template, result, plot_flares=plot_flares, flares=flares)
+
+
+@st.cache_data(ttl=registry.get('goes_protons').ttl, show_spinner=False)
+def goes_protons_png(option, time_range=None):
+    """
+    Returns the PNG figure of the GOES proton monitor, None if there are no data.
+    """
+    from packages.noaa_goes import goes_protons_json
+
+    result, key = _goes_result(goes_protons_json, option, time_range)
+    if result is None:
+        return None
+    template = figures.template(('goes_protons', option), goes_protons_json.figure_template)
+    return figures.cached_template_png(('goes_protons',) + key, template, result)
+
+
+@st.cache_data(ttl=registry.get('solar_probabilities').ttl, show_spinner=False)
+def solar_probabilities_png(mode=None):
+    """
+    Returns the PNG figure of all the solar probabilities, or the timeline of a mode.
+    """
+    from packages.noaa_goes import goes_prop_json
+
+    result = goes_prop_json._load()
+    version = figures.data_version(result)
+    if mode is None:
+        return figures.cached_png(('solar_probabilities', 'all', version),
+                                  lambda: goes_prop_json.plot_latest_prop_all(result, show=False))
+    return figures.cached_png(('solar_probabilities', mode, version),
+                              lambda: goes_prop_json.plot_prop_timeline(result, mode=mode, show=False))
+
+
+def latest_flare():
+    from packages.noaa_goes import goes_sxr_json
+    return goes_sxr_json.latest_flare()
+
+
+# The feeds of the sidebar panels: the latest flare and the SWPC tables. They are
+# downloaded by worker threads (see `modules.fetch_conditions`), so they are not in
+# the Streamlit cache: the files are kept in the process-wide response cache
+# (`packages.cache`) for the ttl of their product, and the latest flare is found
+# in the flux of the GOES SXR store.
+feeds = OrderedDict([('latest_flare', latest_flare)] +
+                    [(name, product.fetch_json) for name, product in registry.products.items()
+                     if product.format == 'table'])
@@ -0,0 +1,83 @@
+"""
+Command line interface of SWMA (run it from the directory of swma.py):
+
+    python cli.py render -o <outdir>                  # render all the figures once
+    python cli.py render -o <outdir> --interval 60    # ... and again every minute
+    python cli.py render -o <outdir> -j 4             # ... on 4 worker processes
+    python cli.py poll -v                             # fill the GOES archive and send the alerts
+
+The ``poll`` command runs the background poller in its own process: it does not
+warm the caches of a running Streamlit application (set SWMA_POLLER=1 for that).
+
+The ``render`` command uses the non-interactive Agg backend of matplotlib, so it
+runs on servers without a display. The rendered images can be served by a static
+web server without any per-request plotting.
+"""
+
+import argparse
+import logging
+import os
+import time
+
+
+def render(args):
+    import matplotlib
+    matplotlib.use('Agg')
+    from packages import renderer
+
+    batch = renderer.Renderer(args.outdir, flares=not args.no_flares, workers=args.workers)
+    try:
+        _render_loop(batch, args)
+    finally:
+        batch.close()
+
+
+def _render_loop(batch, args):
+    while True:
+        start = time.monotonic()
+        written = batch.render()
+        logging.info('Rendered %d figures (%d changed) to %s in %.1f s', len(written),
+                     sum(written.values()), args.outdir, time.monotonic() - start)
+        if not args.interval:
+            return
+        time.sleep(max(args.interval - (time.monotonic() - start), 0))
+
+
+def poll(args):
+    from packages import poller
+
+    running = poller.start_default()
+    while True:
+        time.sleep(60)
+        logging.info('Status: %s', dict(running.status()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='swma', description='Space Weather Monitor Application.')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_render = commands.add_parser('render', help='render the figures of all the products to a directory')
+    parser_render.add_argument('-o', '--outdir', default='figures', help='the output directory')
+    parser_render.add_argument('--no-flares', action='store_true',
+                               help='do not render the GOES SXR figures with the flares')
+    parser_render.add_argument('--interval', type=float, default=0,
+                               help='render again every INTERVAL seconds (default: render once)')
+    parser_render.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                               help='number of worker processes (default: the number of CPUs)')
+    parser_render.set_defaults(func=render)
+
+    parser_poll = commands.add_parser('poll', help='poll the data products to fill the GOES archive and send the alerts')
+    parser_poll.set_defaults(func=poll)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(name)s %(levelname)s: %(message)s')
+    try:
+        args.func(args)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
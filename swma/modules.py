@@ -1,17 +1,16 @@
-import json
-import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from caching import feeds
 from pandas import json_normalize
 
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='swma-conditions')
 
-def current_conditions(st):
-    st.sidebar.markdown("""---""")
-    st.sidebar.markdown("""## Space Weather Conditions ☂: """)
 
-    with urllib.request.urlopen('https://services.swpc.noaa.gov/json/goes/primary/xray-flares-latest.json') as fp:
-        data = json.loads(fp.read().decode())
+def _flare_panel(data):
     latest_flares = json_normalize(data)
     max_class = latest_flares['max_class'][0]
+    color = 'None'
     if max_class is not None:
         max_time = latest_flares['max_time'][0][0:16]
         if 'B' in max_class:
@@ -25,35 +24,82 @@ def current_conditions(st):
     else:
         max_class = 'None'
         max_time = 'Now'
-        color = 'None'
-    st.sidebar.markdown(f"""Latest X-ray solar flare: <br />
-                                     ➠ <span style="color:black; background:{color}">{max_class}</span> @{max_time}""", unsafe_allow_html=True)
-    with urllib.request.urlopen('https://services.swpc.noaa.gov/products/solar-wind/plasma-1-day.json') as fp:
-        data = json.loads(fp.read().decode())
-    # solar_wind_plasma = json_normalize(data)
+    return f"""Latest X-ray solar flare: <br />
+                                     ➠ <span style="color:black; background:{color}">{max_class}</span> @{max_time}"""
+
+
+def _solar_wind_panel(data):
     density = data[-1][1]
-    time  = data[-1][0][0:16]
-    with urllib.request.urlopen('https://services.swpc.noaa.gov/products/solar-wind/plasma-1-day.json') as fp:
-        data = json.loads(fp.read().decode())
-    # solar_wind_plasma = json_normalize(data)
     speed = data[-1][2]
-    time  = data[-1][0][0:16]
-    st.sidebar.markdown(f"""Solar Wind: @{time} <br />
+    time = data[-1][0][0:16]
+    return f"""Solar Wind: @{time} <br />
                                      ➠ Density: {density} protons/cm3 <br />
-                                     ➠ Speed: {speed} km/s  <br />""", unsafe_allow_html=True)
-    with urllib.request.urlopen('https://services.swpc.noaa.gov/products/solar-wind/mag-1-day.json') as fp:
-        data = json.loads(fp.read().decode())
-    # solar_wind_plasma = json_normalize(data)
+                                     ➠ Speed: {speed} km/s  <br />"""
+
+
+def _mag_panel(data):
     mag_tot = data[-1][6]
     mag_z = data[-1][3]
-    time  = data[-1][0][0:16]
-    st.sidebar.markdown(f"""IP Mag. Field: @{time} <br />
+    time = data[-1][0][0:16]
+    return f"""IP Mag. Field: @{time} <br />
                                      ➠ Btot: {mag_tot} nT &nbsp;
-                                     ➠ Bz: {mag_z} nT """, unsafe_allow_html=True)
-    with urllib.request.urlopen('https://services.swpc.noaa.gov/products/noaa-planetary-k-index.json') as fp:
-        data = json.loads(fp.read().decode())
-    # solar_wind_plasma = json_normalize(data)
+                                     ➠ Bz: {mag_z} nT """
+
+
+def _kp_panel(data):
     kp = data[-1][1]
-    time  = data[-1][0][0:16]
-    st.sidebar.markdown(f"""Planetary K-index: <br />
-                                     ➠ Kp: {kp} @{time}""", unsafe_allow_html=True)
+    time = data[-1][0][0:16]
+    return f"""Planetary K-index: <br />
+                                     ➠ Kp: {kp} @{time}"""
+
+
+# The panels of the sidebar in the order they are shown, and their feeds (see `caching.feeds`).
+# The latest flare is found in the GOES SXR flux, which is already downloaded for its plot.
+panels = OrderedDict([('Latest X-ray solar flare', ('latest_flare', _flare_panel)),
+                      ('Solar Wind', ('solar_wind_plasma', _solar_wind_panel)),
+                      ('IP Mag. Field', ('solar_wind_mag', _mag_panel)),
+                      ('Planetary K-index', ('kp', _kp_panel))])
+
+
+def fetch_conditions():
+    """
+    Starts downloading the feeds of the sidebar panels in the background, unless
+    they are cached (see `caching.feeds`). Each feed is requested only once, even
+    if more panels use it.
+    Returns
+    -------
+    `dict`
+        feed -> `concurrent.futures.Future` of the decoded JSON file.
+    """
+    names = OrderedDict.fromkeys(feed for feed, _ in panels.values())
+    return {name: _executor.submit(feeds[name]) for name in names}
+
+
+def current_conditions(st, feeds=None):
+    """
+    Shows the current space weather conditions in the sidebar. Every panel is
+    drawn as soon as its feed is available, so a slow feed does not block the others.
+    Parameters
+    ----------
+    feeds : `dict`
+        The futures of the feeds, as returned by `fetch_conditions`.
+        If None the feeds are requested here.
+    """
+    st.sidebar.markdown("""---""")
+    st.sidebar.markdown("""## Space Weather Conditions ☂: """)
+
+    if feeds is None:
+        feeds = fetch_conditions()
+    placeholders = OrderedDict((name, st.sidebar.empty()) for name in panels)
+    for placeholder in placeholders.values():
+        placeholder.markdown('⏳ Loading...')
+    for future in as_completed(feeds.values()):
+        feed = next(feed for feed, f in feeds.items() if f is future)
+        for name, (panel_feed, panel) in panels.items():
+            if panel_feed != feed:
+                continue
+            try:
+                text = panel(future.result())
+            except Exception:
+                text = f'{name}: currently unavailable'
+            placeholders[name].markdown(text, unsafe_allow_html=True)
@@ -0,0 +1,270 @@
+"""
+Threshold alerts on the live space weather measurements.
+
+A rule watches one column of a feed (e.g. the GOES long channel flux) and is
+raised when a sample crosses its trigger level, e.g. flux >= M1. It is cleared
+only when a sample crosses back its clear level (hysteresis), so a flux that
+hovers around the trigger level raises one alert, not one per sample. Only the
+transitions are sent, and each sample is evaluated once: the engine remembers
+the time of the last sample of every feed and asks the feeds only for the newer
+samples, so a check costs O(new samples) and not O(window).
+
+The first check of a feed only sets the state of its rules: a rule that is
+already raised is sent once, the past transitions are not.
+
+The alerts are sent to sinks (callables that take an `Alert`): `LogSink`,
+`FileSink` (JSON lines) and `WebhookSink` (JSON POST requests). The default
+sinks log the alerts, and also send them to the webhook and the file set in
+the environment variables SWMA_ALERTS_WEBHOOK and SWMA_ALERTS_FILE.
+
+The default engine is checked by the poller (see `packages.poller.default_sources`).
+
+Examples
+--------
+>>> engine = AlertEngine(default_rules(), [LogSink()], default_feeds())
+>>> alerts = engine.check()
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+from packages import fetch, registry
+
+LOGGER = logging.getLogger(__name__)
+
+# A transition of a rule, state is 'raised' or 'cleared'.
+Alert = namedtuple('Alert', 'rule state time value message')
+
+
+class Rule:
+    """
+    A threshold on a column of a feed, with hysteresis.
+    Parameters
+    ----------
+    name : `str`
+        The name of the rule.
+    feed : `str`
+        The name of the feed, see `AlertEngine`.
+    column : `str`
+        The column of the feed.
+    trigger : `float`
+        The rule is raised when a sample reaches this level.
+    clear : `float`
+        The raised rule is cleared when a sample goes past this level.
+    below : `bool`
+        If True the rule is raised by the samples lower than the trigger level
+        (e.g. the southward Bz), otherwise by the samples higher than it.
+    message : `str`
+        The description of the alert.
+    """
+
+    def __init__(self, name, feed, column, trigger, clear, below=False, message=''):
+        self.name = name
+        self.feed = feed
+        self.column = column
+        self.trigger = trigger
+        self.clear = clear
+        self.below = below
+        self.message = message or name
+        self.active = False
+
+    def evaluate(self, frame):
+        """
+        Evaluates the rule on new samples and updates its state.
+        Returns the transitions as `Alert` tuples.
+        """
+        values = frame[self.column].to_numpy(dtype='float64')
+        with np.errstate(invalid='ignore'):
+            if self.below:
+                on, off = values <= self.trigger, values > self.clear
+            else:
+                on, off = values >= self.trigger, values < self.clear
+        # The state after each sample: the last sample that reached a level (NaN reach none)
+        level = np.where(on, 1, np.where(off, 0, -1))
+        last = np.maximum.accumulate(np.where(level >= 0, np.arange(len(level)), -1))
+        state = np.where(last >= 0, level[last], int(self.active))
+        changes = np.flatnonzero(np.diff(state, prepend=int(self.active)))
+        self.active = bool(state[-1]) if len(state) else self.active
+        return [Alert(self.name, 'raised' if state[i] else 'cleared', frame.index[i], values[i], self.message)
+                for i in changes]
+
+
+class AlertEngine:
+    """
+    Evaluates rules on the new samples of their feeds and sends the transitions to sinks.
+    Parameters
+    ----------
+    rules : `list` of `Rule`
+    sinks : `list` of `callable`
+        Each sink is called with every `Alert`.
+    feeds : `dict`
+        The name of a feed -> function that takes the time of the last sample
+        already evaluated (None at the first check) and returns a time-indexed
+        dataframe of the newer samples.
+    """
+
+    def __init__(self, rules, sinks, feeds=None):
+        self.rules = list(rules)
+        self.sinks = list(sinks)
+        self.feeds = feeds or {}
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def evaluate(self, feed, frame):
+        """
+        Evaluates the rules of a feed on its samples newer than the last evaluated
+        sample, sends the alerts and returns them.
+        """
+        with self._lock:
+            last = self._last.get(feed)
+            if last is not None:
+                frame = frame.iloc[frame.index.searchsorted(last, side='right'):]
+            if len(frame) == 0:
+                return []
+            alerts = []
+            for rule in self.rules:
+                if rule.feed != feed:
+                    continue
+                transitions = rule.evaluate(frame)
+                if last is None:
+                    # Only the current state of the rule at the first check
+                    transitions = transitions[-1:] if rule.active else []
+                alerts.extend(transitions)
+            self._last[feed] = frame.index[-1]
+        alerts.sort(key=lambda alert: alert.time)
+        for alert in alerts:
+            self.send(alert)
+        return alerts
+
+    def send(self, alert):
+        for sink in self.sinks:
+            try:
+                sink(alert)
+            except Exception as error:
+                LOGGER.warning('Sending the alert %s to %s failed: %s', alert.rule, sink, error)
+
+    def check(self):
+        """
+        Reads the new samples of all the feeds and evaluates the rules.
+        Returns the alerts that were sent.
+        """
+        alerts = []
+        for feed in OrderedDict.fromkeys(rule.feed for rule in self.rules):
+            alerts.extend(self.evaluate(feed, self.feeds[feed](self._last.get(feed))))
+        return alerts
+
+
+def to_dict(alert):
+    """
+    Returns an alert as a JSON serializable dictionary.
+    """
+    return OrderedDict([('rule', alert.rule), ('state', alert.state),
+                        ('time', pd.Timestamp(alert.time).strftime('%Y-%m-%dT%H:%M:%SZ')),
+                        ('value', float(alert.value)), ('message', alert.message)])
+
+
+class LogSink:
+    def __init__(self, logger=LOGGER):
+        self.logger = logger
+
+    def __call__(self, alert):
+        self.logger.warning('Alert %s %s at %s: %s (%g)', alert.rule, alert.state, alert.time, alert.message,
+                            alert.value)
+
+
+class FileSink:
+    """
+    Appends the alerts to a file, one JSON object per line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, alert):
+        with self._lock, open(self.path, 'a') as file:
+            file.write(json.dumps(to_dict(alert)) + '\n')
+
+
+class WebhookSink:
+    """
+    Sends the alerts to a url as JSON POST requests.
+    """
+
+    def __init__(self, url, timeout=fetch.timeout):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, alert):
+        response = fetch.get_session().post(self.url, json=to_dict(alert), timeout=self.timeout)
+        response.raise_for_status()
+
+
+def _store_feed(store, mode='6-hour'):
+    """
+    Returns a feed of the samples of a GOES time series store.
+    """
+    def feed(after):
+        frame = store.get(mode)[0]
+        if after is not None:
+            frame = frame.iloc[frame.index.searchsorted(after, side='right'):]
+        return frame
+    return feed
+
+
+def _table_feed(name):
+    """
+    Returns a feed of the samples of a SWPC products table of the registry.
+    """
+    product = registry.get(name)
+
+    def feed(after):
+        return product.to_frame(product.fetch_json(), after=after)
+    return feed
+
+
+def default_feeds():
+    from packages.noaa_goes import goes_protons_json, goes_sxr_json
+
+    return {'goes_sxr': _store_feed(goes_sxr_json.store),
+            'goes_protons': _store_feed(goes_protons_json.store),
+            'kp': _table_feed('kp'),
+            'mag': _table_feed('solar_wind_mag')}
+
+
+def default_rules():
+    """
+    Returns the rules of the NOAA space weather alerts: an M1 flare, the S1
+    solar radiation storm (the alert level of the proton plot), a G1
+    geomagnetic storm and a strong southward interplanetary magnetic field.
+    """
+    return [Rule('xray_m1', 'goes_sxr', '0.1-0.8nm', 1e-5, 5e-6,
+                 message='GOES X-ray flux (0.1-0.8 nm) >= M1 (1e-5 W/m^2)'),
+            Rule('proton_s1', 'goes_protons', '>=10 MeV', 10, 5,
+                 message='GOES >=10 MeV proton flux >= 10 pfu (S1)'),
+            Rule('kp_g1', 'kp', 'Kp', 5, 4,
+                 message='Planetary K-index >= 5 (G1)'),
+            Rule('bz_south', 'mag', 'bz_gsm', -10, -5, below=True,
+                 message='IMF Bz <= -10 nT')]
+
+
+def default_sinks():
+    """
+    Returns the log sink, and the webhook and file sinks of the environment
+    variables SWMA_ALERTS_WEBHOOK and SWMA_ALERTS_FILE when they are set.
+    """
+    sinks = [LogSink()]
+    if os.environ.get('SWMA_ALERTS_WEBHOOK'):
+        sinks.append(WebhookSink(os.environ['SWMA_ALERTS_WEBHOOK']))
+    if os.environ.get('SWMA_ALERTS_FILE'):
+        sinks.append(FileSink(os.environ['SWMA_ALERTS_FILE']))
+    return sinks
+
+
+def default_engine():
+    return AlertEngine(default_rules(), default_sinks(), default_feeds())
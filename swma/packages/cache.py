@@ -0,0 +1,127 @@
+"""
+Process-wide cache of the downloaded (and parsed) data products.
+
+The entries are keyed by the url of the product (and the function used to parse
+its content) and hold, next to the parsed value, the HTTP validators (ETag,
+Last-Modified) of the response and the time until which the entry is fresh.
+A stale entry is not thrown away; it is revalidated with a conditional GET and
+reused as is when the server replies with 304 Not Modified.
+The cache lives at module level so it is shared by all the Streamlit sessions
+served by the same process. A cache can be capped to a total size in bytes, in
+which case the least recently used entries are evicted first.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class CacheEntry:
+    """
+    A cached response.
+    """
+    __slots__ = ('value', 'etag', 'last_modified', 'expires', 'size')
+
+    def __init__(self, value, etag=None, last_modified=None, expires=0., size=0):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+        # Size in bytes of the downloaded content.
+        self.size = size
+
+    def is_fresh(self, now=None):
+        return (time.monotonic() if now is None else now) < self.expires
+
+    def validators(self):
+        """
+        Returns the headers of a conditional GET request for this entry.
+        """
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    A thread-safe dictionary of `CacheEntry` with a lock per key, so that
+    concurrent requests of the same product wait for a single download while
+    the downloads of other keys go on. The lock of a key only exists while it
+    is in use, so the locks do not grow with the keys (e.g. the figures keyed
+    by the version of their data).
+    Parameters
+    ----------
+    max_bytes : `int`
+        The maximum total size of the entries, None for no limit.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        # The lock of each key in use and the number of its users.
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @contextmanager
+    def lock(self, key):
+        """
+        Context manager that serializes the downloads of a key.
+        """
+        with self._lock:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._locks[key]
+                if users == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, users - 1)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.size
+            self._entries[key] = entry
+            self.nbytes += entry.size
+            if self.max_bytes is not None:
+                # Evict the least recently used entries (but keep the new one)
+                while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                    _, old = self._entries.popitem(last=False)
+                    self.nbytes -= old.size
+
+    def invalidate(self, url=None):
+        """
+        Drops the entries of an url, or all the entries if no url is given.
+        """
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+                self.nbytes = 0
+            else:
+                for key in [k for k in self._entries if k[0] == url]:
+                    self.nbytes -= self._entries.pop(key).size
@@ -0,0 +1,138 @@
+"""
+Multi-process render farm of the figures.
+
+Matplotlib draws on one core (and holds the GIL), so the figures of a refresh
+cycle are rendered by a pool of worker processes. The parsed data are shipped
+to the workers as plain numpy column arrays (cheap to pickle), never as figures;
+each worker rebuilds the dataframe, draws it with the ``plot_`` function of the
+product (or updates its own template of the figure, see `packages.figures.template`)
+and returns the PNG bytes.
+
+The jobs are scheduled earliest deadline first (the deadline of a figure is
+when its data are replaced, e.g. one minute for the GOES products), and the
+most expensive of the jobs with the same deadline go first. Only as many jobs
+as workers are in flight, so that a job that can no longer meet its deadline
+is dropped before it starts; its figure is rendered in the next cycle instead.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+
+def pack(result):
+    """
+    Returns the data of a plot as numpy arrays.
+    Parameters
+    ----------
+    result : `pandas.DataFrame` or `tuple`
+        A time-indexed dataframe, or a tuple (dataframe, ...) as returned by
+        the ``_to_dataframe`` functions.
+    """
+    frame, rest = (result[0], result[1:]) if isinstance(result, tuple) else (result, None)
+    columns = OrderedDict((name, frame[name].to_numpy()) for name in frame.columns)
+    return frame.index.name, frame.index.to_numpy(), columns, rest
+
+
+def unpack(packed):
+    """
+    Rebuilds the data of a plot from the output of `pack`.
+    """
+    name, index, columns, rest = packed
+    frame = pd.DataFrame(columns, index=pd.DatetimeIndex(index, name=name))
+    return frame if rest is None else (frame,) + rest
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render(plot, template, packed, kwargs):
+    """
+    Draws a figure in a worker and returns its PNG bytes.
+    """
+    import matplotlib.pyplot as plt
+    from packages import figures
+
+    if template is not None:
+        return figures.template(*template).render_png(unpack(packed), **kwargs)
+    plot(unpack(packed), show=False, **kwargs)
+    return figures.render_png(plt.gcf())
+
+
+class RenderFarm:
+    """
+    A pool of processes that render figures.
+    Parameters
+    ----------
+    max_workers : `int`
+        The number of worker processes, by default the number of CPUs.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            # The parent runs threads (the download pools), so the workers are not forked.
+            self._executor = ProcessPoolExecutor(self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker)
+        return self._executor
+
+    def render(self, jobs):
+        """
+        Renders the figures of the jobs, in completion order.
+        Parameters
+        ----------
+        jobs : `list`
+            The jobs, each with the attributes ``plot`` (a module-level plot function),
+            ``result`` (its data), ``kwargs`` (its other arguments), ``deadline``
+            (`time.monotonic` time), ``cost`` (e.g. the number of points) and
+            ``template`` (the arguments of `packages.figures.template`, or None).
+        Yields
+        ------
+        (job, `bytes`)
+            The jobs that failed or missed their deadline are logged and skipped.
+        """
+        pending = sorted(jobs, key=lambda job: (job.deadline, -job.cost))
+        pending.reverse()
+        running = {}
+        while pending or running:
+            while pending and len(running) < self.max_workers:
+                job = pending.pop()
+                if time.monotonic() > job.deadline:
+                    LOGGER.warning('Skipped %s, its deadline has passed', job.filename)
+                    continue
+                future = self._pool().submit(_render, job.plot, job.template, pack(job.result), job.kwargs)
+                running[future] = job
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    png = future.result()
+                except BrokenProcessPool as error:
+                    LOGGER.warning('Rendering %s failed: %s', job.filename, error)
+                    self.shutdown()
+                    continue
+                except Exception as error:
+                    LOGGER.warning('Rendering %s failed: %s', job.filename, error)
+                    continue
+                yield job, png
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
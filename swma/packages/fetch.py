@@ -0,0 +1,179 @@
+"""
+Shared HTTP fetch layer for the SWMA data sources.
+
+Every download of the application (SWPC JSON files, SDO and SoHO images) goes
+through a single `requests.Session`. The session keeps a pool of keep-alive
+connections per host, so the TLS handshake with services.swpc.noaa.gov,
+sdo.gsfc.nasa.gov etc. is paid once per connection and not once per request.
+The requests are made with timeouts, retries with exponential backoff on
+connection errors and server-side failures, and gzip negotiation.
+Products that are updated on a known cadence can be requested with a freshness
+time (ttl); these go through the shared `~packages.cache.ResponseCache` and are
+revalidated with a conditional GET once the ttl has passed.
+
+Examples
+--------
+>>> from packages import fetch
+>>> data = fetch.fetch_json('https://services.swpc.noaa.gov/json/solar_probabilities.json')
+>>> data = fetch.fetch_json('https://services.swpc.noaa.gov/json/solar_probabilities.json', ttl=3600)
+"""
+
+import contextlib
+import json
+import threading
+import time
+
+import requests
+from packages.cache import CacheEntry, ResponseCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts in seconds.
+timeout = (5, 30)
+# Retry policy for the failed requests.
+retries = 3
+backoff_factor = 0.5
+status_forcelist = (429, 500, 502, 503, 504)
+# Number of hosts to keep a pool for, and number of connections per host.
+pool_connections = 8
+pool_maxsize = 16
+
+headers = {
+    'Accept-Encoding': 'gzip, deflate',
+    'User-Agent': 'SWMA (Space Weather Monitor Application)',
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+response_cache = ResponseCache()
+
+_local = threading.local()
+
+
+def _new_session():
+    retry = Retry(total=retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=status_forcelist,
+                  allowed_methods=frozenset(['GET', 'HEAD']),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize,
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(headers)
+    return session
+
+
+def get_session():
+    """
+    Returns the process-wide session that holds the connection pools.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _new_session()
+    return _session
+
+
+def close():
+    """
+    Closes the pooled connections. A new session is created on the next request.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def fetch(url, headers=None, stream=False, timeout=timeout):
+    """
+    Makes a GET request through the shared session.
+    Parameters
+    ----------
+    url : `str`
+        The url of the file to download.
+    headers : `dict`
+        Extra request headers.
+    stream : `bool`
+        If True the body is not downloaded immediately.
+    Returns
+    -------
+    `requests.Response`
+    """
+    response = get_session().get(url, headers=headers, stream=stream, timeout=timeout)
+    response.raise_for_status()
+    return response
+
+
+@contextlib.contextmanager
+def revalidate():
+    """
+    Within this context (and thread) `fetch_cached` revalidates the cached
+    entries even if they are still fresh. Used to keep the cache warm.
+    """
+    _local.revalidate = True
+    try:
+        yield
+    finally:
+        _local.revalidate = False
+
+
+def fetch_cached(url, ttl, parse=None, cache=response_cache):
+    """
+    Returns the content of an url from the cache, downloading it only when
+    the cached entry is older than ttl and has changed on the server.
+    Parameters
+    ----------
+    url : `str`
+        The url of the file to download.
+    ttl : `float`
+        For how many seconds a downloaded file is considered fresh.
+    parse : `callable`
+        Function applied to the content (bytes) of the response. Its result is
+        what gets cached, so a 304 response reuses the already-parsed value.
+        Use a module-level function, the cache is keyed by (url, parse).
+    """
+    key = (url, parse)
+    with cache.lock(key):
+        now = time.monotonic()
+        entry = cache.get(key)
+        if entry is not None and entry.is_fresh(now) and not getattr(_local, 'revalidate', False):
+            return entry.value
+        headers = entry.validators() if entry is not None else None
+        response = get_session().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            entry.expires = now + ttl
+            return entry.value
+        response.raise_for_status()
+        value = response.content if parse is None else parse(response.content)
+        cache.put(key, CacheEntry(value,
+                                  etag=response.headers.get('ETag'),
+                                  last_modified=response.headers.get('Last-Modified'),
+                                  expires=now + ttl,
+                                  size=len(response.content)))
+    return value
+
+
+def fetch_json(url, ttl=None, **kwargs):
+    """
+    Downloads and decodes a JSON file. If a ttl is given the decoded
+    data are cached (see `fetch_cached`).
+    """
+    if ttl is not None:
+        return fetch_cached(url, ttl, parse=json.loads)
+    return fetch(url, **kwargs).json()
+
+
+def fetch_bytes(url, ttl=None, **kwargs):
+    """
+    Downloads a file and returns its (decompressed) content. If a ttl is
+    given the content is cached (see `fetch_cached`).
+    """
+    if ttl is not None:
+        return fetch_cached(url, ttl)
+    return fetch(url, **kwargs).content
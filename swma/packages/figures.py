@@ -0,0 +1,179 @@
+"""
+Process-wide cache of the rendered figures.
+
+Rendering a matplotlib figure is the most CPU-expensive step of a page. The
+figures are rendered once to PNG and the PNG bytes are kept in a size-capped
+(least recently used first) cache shared by all the Streamlit sessions. The
+same bytes are used for the image shown on the page and for the download button.
+The cache key is the product, the plot options and the version of the data
+(see `data_version`), so a figure is rendered again only when new data arrive.
+
+Most of the work of a plot (the axes, the log scales, the coloured class levels,
+the twin axis of the labels, the locators and formatters) does not depend on
+the data. A plot that provides a `FigureTemplate` is built once per product and
+mode; on refresh only its lines are updated with ``set_data``, its time limits
+are moved and it is drawn again. The templates do not use pyplot, so they are
+drawn without the pyplot lock. Matplotlib is imported when the first figure
+is drawn, so the data modules can be imported without it.
+
+Examples
+--------
+>>> key = ('goes_sxr', '1-day', data_version(result[0]))
+>>> png = cached_png(key, lambda: goes_sxr_json.plot_(result, '1-day', show=False))
+>>> template_ = template(('goes_sxr', '1-day', False), goes_sxr_json.figure_template)
+>>> png = cached_template_png(key, template_, result)
+"""
+
+import io
+import math
+import threading
+
+from packages.cache import CacheEntry, ResponseCache
+
+# Resolution of the rendered figures.
+dpi = 150
+# Maximum total size of the cached figures.
+max_bytes = 32 * 1024**2
+
+figure_cache = ResponseCache(max_bytes=max_bytes)
+
+# pyplot keeps a global state (the current figure), so the figures are drawn one at a time.
+_pyplot_lock = threading.Lock()
+
+# The figure templates by product and mode, see `template`.
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def data_version(frame):
+    """
+    Returns the version of a time-indexed dataframe, i.e. its length and its first and last time.
+    """
+    if len(frame) == 0:
+        return (0, None, None)
+    return (len(frame), frame.index[0], frame.index[-1])
+
+
+def render_png(fig, dpi=dpi):
+    """
+    Renders a figure to PNG bytes and closes it.
+    """
+    import matplotlib.pyplot as plt
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=dpi)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def cached_png(key, build):
+    """
+    Returns the PNG bytes of a figure from the cache, rendering it if needed.
+    Parameters
+    ----------
+    key : `tuple`
+        The cache key, its first item is the name of the product
+        (see `invalidate`). Include the plot options and the data version.
+    build : `callable`
+        Function without arguments that draws the figure with pyplot,
+        the current figure is rendered.
+    Returns
+    -------
+    `bytes`
+    """
+    import matplotlib.pyplot as plt
+
+    with figure_cache.lock(key):
+        entry = figure_cache.get(key)
+        if entry is not None:
+            return entry.value
+        with _pyplot_lock:
+            build()
+            png = render_png(plt.gcf())
+        figure_cache.put(key, CacheEntry(png, expires=math.inf, size=len(png)))
+    return png
+
+
+class FigureTemplate:
+    """
+    A figure that is built once and then updated with new data.
+    Parameters
+    ----------
+    build : `callable`
+        Function build(figure) that draws the parts of the plot that do not
+        depend on the data and returns the artists to update (e.g. a dictionary).
+    update : `callable`
+        Function update(figure, artists, result, **kwargs) that updates the
+        artists with the data (e.g. `matplotlib.lines.Line2D.set_data` and
+        the time limits).
+    """
+
+    def __init__(self, build, update):
+        self._build = build
+        self._update = update
+        self.figure = None
+        self.artists = None
+        # A figure is updated and drawn by one thread at a time.
+        self.lock = threading.Lock()
+
+    def update(self, result, **kwargs):
+        """
+        Updates the figure with new data (the figure is built the first time)
+        and returns it, e.g. to show it with ``st.pyplot``.
+        """
+        if self.figure is None:
+            from matplotlib.figure import Figure
+            figure = Figure()
+            artists = self._build(figure)
+            self._update(figure, artists, result, **kwargs)
+            figure.tight_layout()
+            self.figure, self.artists = figure, artists
+        else:
+            self._update(self.figure, self.artists, result, **kwargs)
+        return self.figure
+
+    def render_png(self, result, dpi=dpi, **kwargs):
+        """
+        Updates the figure with new data and returns its PNG bytes.
+        """
+        buffer = io.BytesIO()
+        with self.lock:
+            self.update(result, **kwargs).savefig(buffer, format='png', bbox_inches='tight', dpi=dpi)
+        return buffer.getvalue()
+
+
+def template(key, factory):
+    """
+    Returns the process-wide template of a figure, creating it if needed.
+    Parameters
+    ----------
+    key : `tuple`
+        The product and the plot options (not the data version), e.g. ('goes_sxr', '1-day', False).
+    factory : `callable`
+        Function without arguments that returns a new `FigureTemplate`.
+    """
+    with _templates_lock:
+        if key not in _templates:
+            _templates[key] = factory()
+        return _templates[key]
+
+
+def cached_template_png(key, template_, result, **kwargs):
+    """
+    Returns the PNG bytes of a figure from the cache, updating its template
+    with the data and rendering it if needed (see `cached_png`).
+    """
+    with figure_cache.lock(key):
+        entry = figure_cache.get(key)
+        if entry is not None:
+            return entry.value
+        png = template_.render_png(result, **kwargs)
+        figure_cache.put(key, CacheEntry(png, expires=math.inf, size=len(png)))
+    return png
+
+
+def invalidate(product=None):
+    """
+    Drops the cached figures of a product, or all of them.
+    """
+    figure_cache.invalidate(product)
@@ -0,0 +1,76 @@
+"""
+Concurrent loader of the near-real-time solar images (SDO/AIA, SDO/HMI, SoHO/LASCO).
+
+The images of a page are downloaded in parallel on a bounded,
+process-wide thread pool, so a page with many panels takes about as long as its
+slowest image and not the sum of all of them. A panel whose image cannot be
+loaded is returned as None, so that one failure does not abort the whole page.
+The "latest" images change only every few minutes, so the encoded images are
+kept in a process-wide cache shared by all the sessions. The cache is capped in
+size (least recently used images are evicted first) and a cached image is
+revalidated with its HTTP validators once its ttl has passed.
+"""
+
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from packages import fetch
+from packages.cache import ResponseCache
+from PIL import Image
+
+LOGGER = logging.getLogger(__name__)
+
+# Maximum number of images downloaded at the same time (by all the sessions).
+max_workers = 8
+
+# The SDO and SoHO "latest" images are updated every few minutes.
+ttl = 300
+# Maximum total size of the cached (encoded) images.
+max_bytes = 64 * 1024**2
+
+image_cache = ResponseCache(max_bytes=max_bytes)
+
+_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='swma-images')
+
+
+def _verify(content):
+    """
+    Checks that the downloaded content is an image before it is cached.
+    """
+    Image.open(io.BytesIO(content)).verify()
+    return content
+
+
+def load_image(url, ttl=ttl):
+    """
+    Returns the encoded (e.g. JPEG) image of an url from the image cache,
+    downloading it if it is not cached or it has changed.
+    """
+    return fetch.fetch_cached(url, ttl, parse=_verify, cache=image_cache)
+
+
+def load_images(urls, ttl=ttl):
+    """
+    Loads images in parallel.
+    Parameters
+    ----------
+    urls : `list` of `str`
+        The urls of the images.
+    ttl : `float`
+        For how many seconds a cached image is used without revalidation.
+    Returns
+    -------
+    `list`
+        The encoded images (`bytes`, they can be passed to ``st.image``) in the
+        same order as the urls, or None for the images that failed to load.
+    """
+    futures = [_executor.submit(load_image, url, ttl) for url in urls]
+    images = []
+    for url, future in zip(urls, futures):
+        try:
+            images.append(future.result())
+        except Exception as error:
+            LOGGER.warning('Failed to load image %s: %s', url, error)
+            images.append(None)
+    return images
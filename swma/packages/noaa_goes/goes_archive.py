@@ -0,0 +1,433 @@
+"""
+Persistent local archive of the NOAA GOES near-real-time time series.
+
+SWPC serves only the last 7 days of the GOES measurements, so every new
+measurement read by the time series stores is also appended to an archive on
+the local disk. The archive of a product is partitioned in daily Parquet files
+(zstd compressed), one row per time tag, satellite and channel:
+
+    <root>/<product>/<YYYY-MM-DD>.parquet
+
+A row is stored only once: when a partition is written again, its rows are
+deduplicated on (time_tag, satellite, channel) keeping the latest value. The
+partitions are written atomically (to a temporary file that is then renamed),
+so a reader never sees a partially written file. Any time range can then be
+read back from disk, in the same wide format as the stores (one column per channel).
+
+Next to the Parquet partitions (the archive of record) the archive keeps a query
+index: uncompressed Arrow IPC files with one time column and one column per
+channel, that are memory-mapped by `query` so that only the pages of the
+requested time range are read and the values are returned as zero-copy numpy
+views. The index has three resolutions: the 1-minute measurements (daily files)
+and the 5-minute (monthly files) and 1-hour (yearly files) rollups with the
+minimum, maximum and mean of every channel, so a view of months or years never
+reads the minute data. The index is derived from the Parquet partitions; it is
+updated on every append and can be rebuilt with `Archive.reindex`.
+
+    <root>/<product>/index/<resolution>/<period>.arrow
+
+The root directory is given by the environment variable SWMA_ARCHIVE (by default
+~/.swma/archive), set it to an empty string to disable the archive.
+
+Examples
+--------
+>>> archive = Archive('goes_sxr')
+>>> archive.append(goes_sxr_json.store.get('7-day')[0])
+>>> frame = archive.read('2022-05-01', '2022-05-03')
+>>> time, flux = query('goes_sxr', '0.1-0.8nm', '2022-01-01', '2022-06-01', '1-hour', 'max')
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from packages.noaa_goes.utils import pivot_channels
+
+default_root = os.path.join('~', '.swma', 'archive')
+compression = 'zstd'
+# The columns of the partitions.
+schema = pa.schema([('time_tag', pa.timestamp('ns')),
+                    ('satellite', pa.int16()),
+                    ('channel', pa.dictionary(pa.int8(), pa.string())),
+                    ('flux', pa.float64())])
+# The rows are unique on these columns.
+unique_key = ['time_tag', 'satellite', 'channel']
+
+# The resolutions of the query index: the rollup rule and the period of the files.
+resolutions = OrderedDict([('1-min', ('1min', 'D')),
+                           ('5-min', ('5min', 'M')),
+                           ('1-hour', ('1h', 'Y'))])
+stats = ('min', 'max', 'mean')
+# Maximum number of memory-mapped index files kept open.
+max_maps = 64
+
+_maps = OrderedDict()
+_maps_lock = threading.Lock()
+
+
+def root():
+    """
+    Returns the root directory of the archive, or None if the archive is disabled.
+    """
+    path = os.environ.get('SWMA_ARCHIVE', default_root)
+    return os.path.expanduser(path) if path else None
+
+
+def _write_atomic(path, write):
+    """
+    Writes a file with write(path) through a temporary file in the same directory.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _write_ipc(path, frame):
+    """
+    Writes a time-indexed frame to an uncompressed Arrow IPC file with a single
+    record batch, so that its columns can be memory-mapped as contiguous arrays.
+    The missing values are stored as NaN (not as nulls).
+    """
+    columns = OrderedDict([('time', pa.array(frame.index.to_numpy(dtype='datetime64[ns]')))])
+    for name in frame.columns:
+        columns[name] = pa.array(frame[name].to_numpy())
+    table = pa.table(columns)
+
+    def write(tmp):
+        with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(len(table), 1))
+        # A file cannot be replaced while it is mapped (on Windows)
+        _unmap(path)
+    _write_atomic(path, write)
+
+
+def _read_ipc(path):
+    """
+    Returns the (memory-mapped) table of an index file. The tables are cached
+    until the file is replaced.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_ino, stat.st_mtime_ns)
+    with _maps_lock:
+        if key in _maps:
+            _maps.move_to_end(key)
+            return _maps[key][1]
+    source = pa.memory_map(path)
+    table = pa.ipc.open_file(source).read_all()
+    with _maps_lock:
+        _maps[key] = (source, table)
+        while len(_maps) > max_maps:
+            _maps.popitem(last=False)[1][0].close()
+    return table
+
+
+def _unmap(path):
+    """
+    Closes and drops the cached memory maps of an index file. The tables already
+    read from it stay valid until they are released.
+    """
+    with _maps_lock:
+        for key in [key for key in _maps if key[0] == path]:
+            _maps.pop(key)[0].close()
+
+
+def _column(table, name):
+    column = table.column(name)
+    if column.num_chunks == 1:
+        return column.chunk(0).to_numpy(zero_copy_only=True)
+    return column.to_numpy()
+
+
+def rollup(frame, rule):
+    """
+    Returns the minimum, maximum and mean of every channel of a wide frame in
+    time bins (e.g. '5min'), in columns '<channel>:<stat>'. The bins without
+    measurements are dropped.
+    """
+    channels = [name for name in frame.columns if name != 'satellite']
+    bins = frame[channels].resample(rule)
+    result = bins.agg(list(stats))
+    result.columns = [f'{name}:{stat}' for name, stat in result.columns]
+    return result[bins.count().sum(axis=1).to_numpy() > 0]
+
+
+def pick_resolution(tstart, tend, points):
+    """
+    Returns the finest resolution of the query index that gives at most
+    about `points` samples between two times (e.g. the width of a plot in pixels),
+    the finest one if `points` is None.
+    """
+    if points is None:
+        return next(iter(resolutions))
+    span = pd.Timestamp(tend) - pd.Timestamp(tstart)
+    for resolution, (rule, _) in resolutions.items():
+        if span / pd.Timedelta(rule) <= points:
+            return resolution
+    return resolution
+
+
+def to_long(frame, channels=None):
+    """
+    Converts a wide frame of a store (the satellite and one column per channel)
+    to the rows of the archive, without the missing measurements.
+    """
+    if channels is None:
+        channels = [name for name in frame.columns if name != 'satellite']
+    n = len(frame)
+    satellite = frame['satellite'].to_numpy() if 'satellite' in frame else np.zeros(n, dtype='int16')
+    flux = np.concatenate([frame[name].to_numpy(dtype='float64') for name in channels]) if channels else []
+    long = pd.DataFrame({'time_tag': np.tile(frame.index.to_numpy(), len(channels)),
+                         'satellite': np.tile(satellite, len(channels)).astype('int16'),
+                         'channel': pd.Categorical.from_codes(np.repeat(np.arange(len(channels)), n),
+                                                              categories=channels),
+                         'flux': flux})
+    return long[~np.isnan(long['flux'].to_numpy())]
+
+
+class Archive:
+    """
+    The daily partitions of a product.
+    Parameters
+    ----------
+    product : `str`
+        The name of the product, also the name of its directory.
+    path : `str`
+        The root directory, by default `root`.
+    """
+
+    def __init__(self, product, path=None):
+        self.product = product
+        self.path = path
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        path = self.path if self.path is not None else root()
+        return None if path is None else os.path.join(path, self.product)
+
+    def partition(self, day):
+        return os.path.join(self.directory, f'{pd.Timestamp(day):%Y-%m-%d}.parquet')
+
+    def days(self):
+        """
+        Returns the days of the partitions in the archive.
+        """
+        directory = self.directory
+        if directory is None or not os.path.isdir(directory):
+            return []
+        return sorted(pd.Timestamp(name[:-len('.parquet')]) for name in os.listdir(directory)
+                      if name.endswith('.parquet'))
+
+    def append(self, frame):
+        """
+        Appends the measurements of a wide frame (e.g. the new rows of a store)
+        to the archive. Only the partitions of the days in the frame are written.
+        The query index of these days is updated.
+        Returns the number of rows in the written partitions.
+        """
+        directory = self.directory
+        if directory is None or len(frame) == 0:
+            return 0
+        long = to_long(frame)
+        os.makedirs(directory, exist_ok=True)
+        rows = 0
+        days = long['time_tag'].dt.normalize().to_numpy()
+        with self._lock:
+            for day in np.unique(days):
+                merged = self._merge(self.partition(day), long[days == day])
+                self._index(day, merged)
+                rows += len(merged)
+        return rows
+
+    def index_file(self, resolution, time):
+        """
+        Returns the path of the index file of a resolution that contains a time.
+        """
+        period = pd.Timestamp(time).to_period(resolutions[resolution][1])
+        return os.path.join(self.directory, 'index', resolution, f'{period}.arrow')
+
+    def _index(self, day, long):
+        """
+        Updates the query index with the rows of a day partition.
+        """
+        if self.directory is None:
+            return
+        rows = long.set_index('time_tag')
+        rows['channel'] = rows['channel'].astype('category')
+        wide = pivot_channels(rows, 'channel')
+        day = pd.Timestamp(day)
+        for resolution, (rule, period) in resolutions.items():
+            path = self.index_file(resolution, day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if period == 'D':
+                _write_ipc(path, wide)
+                continue
+            frame = rollup(wide, rule)
+            if os.path.exists(path):
+                # Replace the rollups of this day in the file of the period
+                old = _read_ipc(path).to_pandas().set_index('time')
+                old = old[(old.index < day) | (old.index >= day + pd.Timedelta(days=1))]
+                frame = pd.concat([old, frame]).sort_index()
+            _write_ipc(path, frame)
+
+    def reindex(self):
+        """
+        Rebuilds the query index from the Parquet partitions.
+        """
+        if self.directory is None:
+            return
+        with self._lock:
+            for day in self.days():
+                self._index(day, pq.read_table(self.partition(day)).to_pandas())
+
+    def query(self, channel, tstart, tend, resolution='1-min', stat='mean'):
+        """
+        Returns the measurements of a channel between two times (included)
+        from the memory-mapped query index.
+        Parameters
+        ----------
+        channel : `str`
+            The channel, e.g. '0.1-0.8nm'.
+        resolution : `str`
+            One of `resolutions`.
+        stat : `str`
+            The statistic of the rollups, one of `stats` (ignored for '1-min').
+        Returns
+        -------
+        time, values : `numpy.ndarray`
+            datetime64[ns] and float64 arrays. They are read-only, zero-copy
+            views of the index file when the range is within one file
+            (a day, a month or a year, depending on the resolution).
+        """
+        if resolution not in resolutions:
+            raise ValueError(f'Got unknown resolution "{resolution}"')
+        if stat not in stats:
+            raise ValueError(f'Got unknown statistic "{stat}"')
+        if self.directory is None:
+            # The archive is disabled
+            return np.array([], dtype='datetime64[ns]'), np.array([], dtype='float64')
+        name = channel if resolution == '1-min' else f'{channel}:{stat}'
+        tstart, tend = pd.Timestamp(tstart), pd.Timestamp(tend)
+        periods = pd.period_range(tstart, tend, freq=resolutions[resolution][1])
+        times, values = [], []
+        for period in periods:
+            path = self.index_file(resolution, period.start_time)
+            if not os.path.exists(path):
+                continue
+            table = _read_ipc(path)
+            time = _column(table, 'time')
+            # The time column is sorted, a binary search finds the rows of the range.
+            start, stop = time.searchsorted(tstart.to_datetime64()), time.searchsorted(tend.to_datetime64(), 'right')
+            times.append(time[start:stop])
+            values.append(_column(table, name)[start:stop] if name in table.column_names
+                          else np.full(stop - start, np.nan))
+        if not times:
+            return np.array([], dtype='datetime64[ns]'), np.array([], dtype='float64')
+        if len(times) == 1:
+            return times[0], values[0]
+        return np.concatenate(times), np.concatenate(values)
+
+    def _merge(self, path, new):
+        new = new.astype({'channel': 'object'})
+        if os.path.exists(path):
+            old = pq.read_table(path).to_pandas().astype({'channel': 'object'})
+            new = pd.concat([old, new], ignore_index=True)
+        new = new.drop_duplicates(unique_key, keep='last').sort_values(['time_tag', 'channel'], kind='stable')
+        table = pa.Table.from_pandas(new, preserve_index=False).cast(schema)
+        _write_atomic(path, lambda tmp: pq.write_table(table, tmp, compression=compression))
+        return new
+
+    def read_long(self, tstart, tend):
+        """
+        Returns the rows of the archive between two times (included).
+        """
+        tstart, tend = pd.Timestamp(tstart), pd.Timestamp(tend)
+        tables = []
+        for day in pd.date_range(tstart.normalize(), tend.normalize(), freq='D'):
+            path = self.partition(day) if self.directory is not None else None
+            if path is not None and os.path.exists(path):
+                tables.append(pq.read_table(path, filters=[('time_tag', '>=', tstart),
+                                                           ('time_tag', '<=', tend)]))
+        if not tables:
+            return schema.empty_table().to_pandas()
+        return pa.concat_tables([table.cast(schema) for table in tables]).to_pandas()
+
+    def read(self, tstart, tend, channels=None):
+        """
+        Returns the measurements between two times as a wide frame,
+        with the satellite and one column per channel (see `pivot_channels`).
+        """
+        long = self.read_long(tstart, tend)
+        frame = long.set_index('time_tag')
+        frame['channel'] = frame['channel'].astype('category')
+        result = pivot_channels(frame, 'channel', channels=channels)
+        if channels is not None:
+            # The channels without measurements in the range are missing.
+            for name in channels:
+                if name not in result:
+                    result[name] = np.nan
+            result = result[['satellite'] + list(channels)]
+        return result
+
+
+def query_range(archive, channels, tstart, tend, points, live=None, stat='max'):
+    """
+    Returns the measurements of the channels between two times, from the query
+    index at the resolution that fits a number of points (see `pick_resolution`),
+    merged with the live measurements that are not archived yet.
+    Parameters
+    ----------
+    archive : `Archive`
+    channels : `list`
+    points : `int`
+        The maximum number of points, e.g. the width of the plot in pixels.
+    live : `pandas.DataFrame`
+        The wide frame of the live store, its rows newer than the archive are appended
+        (at the same resolution).
+    stat : `str`
+        The statistic of the rollups, by default the maximum so that the peaks are kept.
+    Returns
+    -------
+    `pandas.DataFrame`
+        Time-indexed frame with one column per channel.
+    """
+    tstart, tend = pd.Timestamp(tstart), pd.Timestamp(tend)
+    resolution = pick_resolution(tstart, tend, points)
+    columns = OrderedDict()
+    time = np.array([], dtype='datetime64[ns]')
+    for name in channels:
+        time, columns[name] = archive.query(name, tstart, tend, resolution, stat)
+    frame = pd.DataFrame(columns, index=pd.DatetimeIndex(time), columns=channels)
+    if live is not None and len(live):
+        start = tstart
+        if len(frame):
+            start = frame.index[-1]
+            if live.index[0] <= start:
+                # The last bin of the archive may be incomplete, it is computed again from the live data.
+                frame = frame[frame.index < start]
+            else:
+                start += pd.Timedelta(1)
+        tail = live.loc[(live.index >= max(start, tstart)) & (live.index <= tend),
+                        [name for name in channels if name in live]]
+        if len(tail) and resolution != '1-min':
+            tail = tail.resample(resolutions[resolution][0]).agg(stat).dropna(how='all')
+        frame = pd.concat([frame, tail]) if len(frame) else tail.reindex(columns=channels)
+    return frame
+
+
+def query(product, channel, tstart, tend, resolution='1-min', stat='mean'):
+    """
+    Returns the measurements of a channel of a product between two times
+    from the archive, see `Archive.query`.
+    """
+    return Archive(product).query(channel, tstart, tend, resolution, stat)
@@ -0,0 +1,191 @@
+"""
+Detection of the solar flares in the GOES XRS long channel (0.1-0.8 nm) flux.
+
+The flares are found with the NOAA SWPC rules:
+
+- start: the first minute of a sequence of 4 minutes of monotonic increase of
+  the flux, where the flux of the last minute is at least 1.4 times the flux
+  of the first minute;
+- peak: the minute of the maximum flux;
+- end: the first minute after the peak when the flux has decayed to half way
+  between the peak and the start flux, or the start of the next flare when the
+  background has risen and the flux does not decay that far. A flare lasts at
+  most `max_minutes`.
+
+The class of a flare is the letter of the decade of its peak flux (A, B, C, M, X)
+followed by the peak flux in units of that decade, e.g. M2.5 for 2.5e-5 W/m^2.
+
+`detect` scans the arrays of a time series at once. `FlareDetector` runs it
+incrementally on a live series: it keeps only the minutes that can still be
+part of a flare (the last minutes, or the minutes since the start of a flare
+in progress), so each new minute is processed without scanning the whole series.
+
+Examples
+--------
+>>> detector = FlareDetector()
+>>> flares = detector.update(goes_sxr_json.store.get('7-day')[0]['0.1-0.8nm'])
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Number of minutes of monotonic increase at the start of a flare.
+rise_minutes = 4
+# Minimum ratio of the flux at the end and at the start of the rise.
+rise_ratio = 1.4
+# Maximum duration of a flare, a flare that has not ended is closed then.
+max_minutes = 4 * 60
+# The flux decades of the classes.
+classes = ('A', 'B', 'C', 'M', 'X')
+class_base = 1e-8
+
+columns = ['begin_time', 'end_time', 'max_xrlong', 'max_class']
+
+
+def goes_class(flux):
+    """
+    Returns the GOES class of peak fluxes in W/m^2, e.g. 'M2.5'.
+    """
+    flux = np.atleast_1d(np.asarray(flux, dtype='float64'))
+    decade = np.clip(np.floor(np.log10(flux / class_base)).astype(int), 0, len(classes) - 1)
+    # e.g. 9.99e-6 is C10.0 once rounded, so it is M1.0
+    decade += (np.round(flux / (class_base * 10.0 ** decade), 1) >= 10) & (decade < len(classes) - 1)
+    value = flux / (class_base * 10.0 ** decade)
+    return np.array([f'{classes[d]}{v:.1f}' for d, v in zip(decade, value)], dtype='object')
+
+
+def _starts(flux):
+    """
+    Returns the indices of the minutes that satisfy the start rule.
+    """
+    n = rise_minutes - 1
+    if len(flux) < rise_minutes:
+        return np.array([], dtype=np.intp)
+    with np.errstate(invalid='ignore'):
+        up = np.diff(flux) > 0
+        rising = np.lib.stride_tricks.sliding_window_view(up, n).all(axis=1)
+        ratio = flux[n:] >= rise_ratio * flux[:-n]
+    return np.flatnonzero(rising & ratio)
+
+
+def _scan(flux):
+    """
+    Finds the flares in a time series.
+    Returns the (start, peak, end) indices of the flares, the end is -1 for a
+    flare in progress (its peak is the maximum so far).
+    """
+    flares = []
+    after = 0
+    starts = _starts(flux)
+    for start in starts:
+        if start < after:
+            # A start during the previous flare
+            continue
+        # The flux has decayed when it is below half way between the peak so far and the start flux
+        with np.errstate(invalid='ignore'):
+            peak = np.fmax.accumulate(flux[start:])
+            decayed = flux[start:] <= (peak + flux[start]) / 2
+            # A new flare that starts after the peak ends this one (e.g. on a risen background)
+            restarts = starts[starts > start] - start
+            decayed[restarts[flux[start + restarts] < peak[restarts]]] = True
+        decayed[:rise_minutes] = False
+        decayed[max_minutes:max_minutes + 1] = True
+        ends = np.flatnonzero(decayed)
+        if len(ends) == 0:
+            flares.append((start, start + int(np.nanargmax(flux[start:])), -1))
+            break
+        end = start + int(ends[0])
+        flares.append((start, start + int(np.nanargmax(flux[start:end])), end))
+        after = end
+    return flares
+
+
+def _frame(time, flux, flares):
+    """
+    Returns the flares found by `_scan` as a dataframe indexed by the time of
+    their maximum, with the columns of the SWPC flares JSON file.
+    """
+    starts, peaks, ends = np.array(flares, dtype=np.intp).reshape(-1, 3).T
+    end_time = np.where(ends >= 0, time[ends], np.datetime64('NaT', 'ns'))
+    return pd.DataFrame({'begin_time': time[starts],
+                         'end_time': end_time,
+                         'max_xrlong': flux[peaks],
+                         'max_class': goes_class(flux[peaks])},
+                        index=pd.DatetimeIndex(time[peaks], name='max_time'),
+                        columns=columns).astype({'max_class': 'object'})
+
+
+def detect(series):
+    """
+    Finds the flares in a long channel flux time series.
+    Parameters
+    ----------
+    series : `pandas.Series`
+        The 1-minute flux (W/m^2) with a time index.
+    Returns
+    -------
+    `pandas.DataFrame`
+        The flares indexed by the time of their maximum, with the columns
+        begin_time, end_time (NaT for a flare in progress), max_xrlong and max_class.
+    """
+    time = series.index.to_numpy(dtype='datetime64[ns]')
+    flux = series.to_numpy(dtype='float64')
+    return _frame(time, flux, _scan(flux))
+
+
+class FlareDetector:
+    """
+    Finds the flares of a live time series incrementally.
+    Parameters
+    ----------
+    window : `pandas.Timedelta`
+        The flares that ended before this window (back from the last minute) are dropped.
+    """
+
+    def __init__(self, window=pd.Timedelta(days=7)):
+        self.window = window
+        self._lock = threading.Lock()
+        # The minutes that can still be part of a flare
+        self._time = np.array([], dtype='datetime64[ns]')
+        self._flux = np.array([], dtype='float64')
+        # The flares that have ended, and the flare in progress
+        self._ended = _frame(self._time, self._flux, [])
+        self._current = self._ended
+
+    def update(self, series):
+        """
+        Processes the minutes of a series that are newer than the last update,
+        the series can be the whole live time series.
+        Returns the flares (see `detect`), including the flare in progress.
+        """
+        time = series.index.to_numpy(dtype='datetime64[ns]')
+        with self._lock:
+            first = time.searchsorted(self._time[-1], side='right') if len(self._time) else 0
+            if first == len(time):
+                return self.flares()
+            self._time = np.concatenate([self._time, time[first:]])
+            self._flux = np.concatenate([self._flux, series.to_numpy(dtype='float64')[first:]])
+            flares = _scan(self._flux)
+            ended = [flare for flare in flares if flare[2] >= 0]
+            current = [flare for flare in flares if flare[2] < 0]
+            if ended:
+                self._ended = pd.concat([self._ended, _frame(self._time, self._flux, ended)])
+                self._ended = self._ended[self._ended['end_time'] >= time[-1] - self.window]
+            self._current = _frame(self._time, self._flux, current)
+            # Keep the minutes of the flare in progress, or the last minutes of a possible start
+            if current:
+                keep = current[0][0]
+            else:
+                keep = max(len(self._time) - (rise_minutes - 1), ended[-1][2] if ended else 0)
+            self._time, self._flux = self._time[keep:], self._flux[keep:]
+            return self.flares()
+
+    def flares(self):
+        """
+        Returns the flares found so far, including the flare in progress.
+        """
+        if len(self._current) == 0:
+            return self._ended
+        return pd.concat([self._ended, self._current])
@@ -1,39 +1,34 @@
 import argparse
-import json
 import os
-import urllib.request
 
-import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
-import pandas as pd
-import streamlit as st
-from pandas import json_normalize
-from sunpy.time import parse_time
+from packages import registry
 
-url = 'https://services.swpc.noaa.gov/json/solar_probabilities.json'
+# The declaration of the solar probabilities file, see `packages.registry`.
+product = registry.get('solar_probabilities')
+# The solar probabilities are updated daily, revalidate them hourly.
+ttl = product.ttl
+# The fields read from the JSON file and their dtypes.
+schema = product.schema
 
 
 def _parse_json_file():
     """
     Parses an NOAA solar_probabilities JSON file.
-    Parameters
-    ----------
-    filepath : `str`
-        The path or url to the file you want to parse.
     """
-    with urllib.request.urlopen(url) as fp:
-        data = json.loads(fp.read().decode())
-    return data
+    return product.fetch_json()
 
 
 def _to_dataframe(data):
     # Convert the json data to Dataframe
-    result = json_normalize(data)
-    result = result.set_index('date')
-    result.index = pd.DatetimeIndex(result.index.values)
-    result.index = pd.DatetimeIndex(parse_time(
-        [x for x in result.index.values]).isot.astype('datetime64'))
-    return result
+    return product.to_dataframe(data)
+
+
+def _load():
+    """
+    Downloads the NOAA solar_probabilities JSON file and converts it to a dataframe.
+    The result is cached and reused until the file changes on the server.
+    """
+    return product.load()
 
 
 def autolabel(ax, bars, hbar=True):
@@ -57,7 +52,7 @@ def autolabel(ax, bars, hbar=True):
                     ha='center', va='bottom', rotation=90)
 
 
-def plot_latest_prop_all(result, outfile='', in_app=False, **plot_args):
+def plot_latest_prop_all(result, outfile='', in_app=False, show=True, **plot_args):
     """
     Plot the data from the solar_probabilities JSON file.
     Parameters
@@ -66,21 +61,23 @@ def plot_latest_prop_all(result, outfile='', in_app=False, **plot_args):
     mode : `str`
         The mode of json file you want to process
     """
+    import matplotlib.pyplot as plt
+
     fig = plt.figure()
     fig.set_size_inches(5.5, 5)
     ax = fig.add_subplot(111)
-    y = (result['c_class_1_day'][0],
-         result['c_class_2_day'][0],
-         result['c_class_3_day'][0],
-         result['m_class_1_day'][0],
-         result['m_class_2_day'][0],
-         result['m_class_3_day'][0],
-         result['x_class_1_day'][0],
-         result['x_class_2_day'][0],
-         result['x_class_3_day'][0],
-         result['10mev_protons_1_day'][0],
-         result['10mev_protons_2_day'][0],
-         result['10mev_protons_3_day'][0])
+    y = (result['c_class_1_day'].iloc[0],
+         result['c_class_2_day'].iloc[0],
+         result['c_class_3_day'].iloc[0],
+         result['m_class_1_day'].iloc[0],
+         result['m_class_2_day'].iloc[0],
+         result['m_class_3_day'].iloc[0],
+         result['x_class_1_day'].iloc[0],
+         result['x_class_2_day'].iloc[0],
+         result['x_class_3_day'].iloc[0],
+         result['10mev_protons_1_day'].iloc[0],
+         result['10mev_protons_2_day'].iloc[0],
+         result['10mev_protons_3_day'].iloc[0])
     x = (1, 2, 3, 5, 6, 7, 9, 10, 11, 13, 14, 15)
     abar = plt.barh(x, y, color=('lightgreen', 'lightblue', 'lightcoral',
                                  'lightgreen', 'lightblue', 'lightcoral',
@@ -109,14 +106,18 @@ def plot_latest_prop_all(result, outfile='', in_app=False, **plot_args):
         fig.savefig(save_path, bbox_inches='tight', dpi=150)
 
     if in_app:
+        import streamlit as st
         st.pyplot(fig)
-    else:
+    elif show:
         plt.show()
 
     return plt
 
 
-def plot_prop_timeline(result, mode='c_class', outfile='', in_app=False, **plot_args):
+def plot_prop_timeline(result, mode='c_class', outfile='', in_app=False, show=True, **plot_args):
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
     fig = plt.figure()
     fig.set_size_inches(5.5, 4.5)
     ax = fig.add_subplot(111)
@@ -134,25 +135,25 @@ def plot_prop_timeline(result, mode='c_class', outfile='', in_app=False, **plot_
         fig.savefig(save_path, bbox_inches='tight', dpi=150)
 
     if in_app:
+        import streamlit as st
         st.pyplot(fig)
-    else:
+    elif show:
         plt.show()
 
     return plt
 
 
-def produce_plot(in_app=False):
+def produce_plot(in_app=False, outfile=''):
     """
-    Downloads an NOAA GOES SXR NRT JSON file and process it
+    Downloads the NOAA solar_probabilities JSON file and process it
     into a plot.
     Parameters
     ----------
-    mode : `str`
-        The mode of json file you want to process
+    outfile : `str`
+        The directory to save the plot in, if given the plot is not shown.
     """
-    data = _parse_json_file()
-    result = _to_dataframe(data)
-    plt = plot_latest_prop_all(result, in_app=in_app)
+    result = _load()
+    plt = plot_latest_prop_all(result, outfile=outfile, in_app=in_app, show=outfile == '')
 
     return plt
 
@@ -163,7 +164,7 @@ def produce_plot(in_app=False):
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('-mode', '--mode', default='1-day',
-                        choices=['6-hour', '1-day', '3-day', '7-day'])
+    parser.add_argument('-o', '--outfile', default='',
+                        help='directory to save the plot in (instead of showing it)')
     args = parser.parse_args()
-    produce_plot(mode=args.mode)
+    produce_plot(outfile=args.outfile)
@@ -26,102 +26,96 @@ References
 """
 
 import argparse
-import json
 import os
-import urllib.request
 from collections import OrderedDict
 
-import astropy.units as u
-import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
-import pandas as pd
-import streamlit as st
-from pandas import json_normalize
-from sunpy.time import parse_time
-from sunpy.util.metadata import MetaDict
+from packages import figures, registry
+from packages.noaa_goes.goes_store import GoesSeries
 
-url_sxr = 'https://services.swpc.noaa.gov/json/goes/primary/integral-protons-?.json'
+# The declaration of the proton files, see `packages.registry`.
+product = registry.get('goes_protons')
+# The proton files are updated every 1-minute.
+ttl = product.ttl
+# The fields read from the JSON file and their dtypes.
+schema = product.schema
+# The integral energy channels, each one becomes a column of the dataframe.
+channels = product.channels
 
 
 def _parse_json_file(mode):
     """
-    Parses an NOAA GOES SXR JSON file.
+    Parses an NOAA GOES proton JSON file.
     Parameters
     ----------
-    filepath : `str`
-        The path or url to the file you want to parse.
+    mode : `str`
+        The mode of the file, e.g. '1-day'.
     """
-    url = (url_sxr).replace('?', mode)
-    with urllib.request.urlopen(url) as fp:
-        data = json.loads(fp.read().decode())
-    return data
+    return product.fetch_json(mode)
 
 
 def _to_dataframe(data):
-    # Convert the json data to Dataframe
-    result = json_normalize(data)
-    # Convoluted time index handling
-    result = result.set_index('time_tag')
-    result.index = pd.DatetimeIndex(result.index.values)
-    result.index = pd.DatetimeIndex(parse_time(
-        [x for x in result.index.values]).isot.astype('datetime64'))
-    # Add the units on data.
-    units = OrderedDict([('satellite', u.dimensionless_unscaled),
-                         ('flux', u.W/u.m**2),
-                         ('energy', u.MeV)])
-    return result, MetaDict(
-        {'comments': 'Merged time serie for 0.1-0.8nm & 0.05-0.4nm wavelengths'}), units
+    # One flux column per energy channel on a common time axis, with units
+    return product.to_dataframe(data)
 
 
-def _split_to_data(result, type_):
-    dataframe_ = result[0]
-    dataframe = dataframe_[dataframe_['energy'] == type_]
-    return dataframe
+def _result(frame):
+    return product.result(frame)
 
 
-def plot_(result, mode='1-day', type_='GOES-Long_and_Short', outfile='', in_app=False,
-          **plot_args):
+def _load(mode):
     """
-    Plot the data from the GOES SXR JSON file.
-    Parameters
-    ----------
-    result: dataframe
-    mode : `str`
-        The mode of json file you want to process
+    Downloads an NOAA GOES proton JSON file and converts it to a dataframe.
+    The result is cached and reused until the file changes on the server.
     """
-    # plt.figure(dpi=150)
-    fig, axes = plt.subplots()
-    fig.set_size_inches(5.5, 5)
+    return product.load(mode)
+
+
+# The 7-day time series topped up with the 6-hour file, and the local archive
+# of the measurements (see `goes_store.GoesSeries`). The time series are decimated
+# to `series.decimation` time bins (about the width of the plot in pixels) before
+# they are plotted, set it to None to plot all the samples.
+series = GoesSeries(product, decimation=700)
+archive = series.archive
+store = series.store
+load_range = series.load_range
+query_range = series.query_range
+_decimate = series.decimate
+
+
+def _split_to_data(result, type_):
+    return result[0][type_]
 
-    GOES_1MeV = _split_to_data(result, '>=1 MeV')
-    axes.plot(GOES_1MeV.index, GOES_1MeV['flux'],
-              marker='', color='orange', linewidth=1, label='GOES->1MeV')
 
-    GOES_10MeV = _split_to_data(result, '>=10 MeV')
-    axes.plot(GOES_10MeV.index, GOES_10MeV['flux'],
-              marker='', color='red', linewidth=1, label='GOES->10MeV')
+# The color and the label of the channels in the plot.
+styles = OrderedDict([('>=1 MeV', ('orange', 'GOES->1MeV')),
+                      ('>=10 MeV', ('red', 'GOES->10MeV')),
+                      ('>=50 MeV', ('blue', 'GOES->50MeV')),
+                      ('>=100 MeV', ('green', 'GOES->100MeV')),
+                      ('>=500 MeV', ('black', 'GOES->500MeV'))])
 
-    GOES_50MeV = _split_to_data(result, '>=50 MeV')
-    axes.plot(GOES_50MeV.index, GOES_50MeV['flux'],
-              marker='', color='blue', linewidth=1, label='GOES->50MeV')
 
-    GOES_100MeV = _split_to_data(result, '>=100 MeV')
-    axes.plot(GOES_100MeV.index, GOES_100MeV['flux'],
-              marker='', color='green', linewidth=1, label='GOES->100MeV')
+def _build_figure(fig):
+    """
+    Draws the parts of the plot that do not depend on the data (the axes, the
+    alert levels and their labels) and empty lines for the flux.
+    Returns the artists that are updated with the data, see `_update_figure`.
+    """
+    import matplotlib.dates as mdates
 
-    GOES_500MeV = _split_to_data(result, '>=500 MeV')
-    axes.plot(GOES_500MeV.index, GOES_500MeV['flux'],
-              marker='', color='black', linewidth=1, label='GOES->500MeV')
+    fig.set_size_inches(5.5, 5)
+    axes = fig.add_subplot()
+    axes.xaxis_date()
+    lines = OrderedDict()
+    for name, (color, label) in styles.items():
+        lines[name], = axes.plot([], [], marker='', color=color, linewidth=1, label=label)
 
     axes.set_title('NOAA - GOES Proton Flux (1-minute average)')
     axes.set_xlabel('Time [UT]')
     axes.set_ylabel(r'Flux [$Particles \cdot cm^{-2} s^{-1} sr^{-1} $]')
-    plt.yscale('log')
-    plt.ylim([1e-2, 1e4])
-    axes.set_xlim([GOES_1MeV.index[0], GOES_1MeV.index[-1]])
+    axes.set_yscale('log')
+    axes.set_ylim([1e-2, 1e4])
     axes.grid(True, which='minor', linewidth=0.5)
     axes.grid(True, which='major', linewidth=0.5)
-    ymin, ymax = axes.get_ylim()
     axes.legend(fontsize=8)
 
     # Add a color to the classes limits
@@ -144,12 +138,48 @@ def plot_(result, mode='1-day', type_='GOES-Long_and_Short', outfile='', in_app=
     fig.autofmt_xdate(bottom=0, rotation=0, ha='center')
 
     # Here it needs some attention of the limits and the class labels
-    ax2 = plt.gca().twinx()
+    ax2 = axes.twinx()
     ax2.set_yscale('log')
     ax2.set_ylim(axes.get_ylim())
     ax2.set_yticklabels(['', '', '', 'N \u2192', 'SEP', '\u2190 Y', ''], rotation=270, va='center')
     ax2.set_ylabel('Alert Thresshold', rotation=270, va='bottom')
+    return {'axes': axes, 'lines': lines}
+
 
+def _update_figure(fig, artists, result):
+    """
+    Updates the artists of `_build_figure` with new data.
+    """
+    for name, line in artists['lines'].items():
+        flux = _split_to_data(result, name)
+        line.set_data(flux.index.to_numpy(), flux.to_numpy())
+    artists['axes'].set_xlim([result[0].index[0], result[0].index[-1]])
+
+
+def figure_template():
+    """
+    Returns a figure of the plot that is built once and updated with new data,
+    see `packages.figures.FigureTemplate`.
+    """
+    return figures.FigureTemplate(_build_figure, _update_figure)
+
+
+def plot_(result, mode='1-day', type_='GOES-Long_and_Short', outfile='', in_app=False,
+          show=True, **plot_args):
+    """
+    Plot the data from the GOES SXR JSON file.
+    Parameters
+    ----------
+    result: dataframe
+    mode : `str`
+        The mode of json file you want to process
+    """
+    import matplotlib.pyplot as plt
+
+    # plt.figure(dpi=150)
+    fig = plt.figure()
+    artists = _build_figure(fig)
+    _update_figure(fig, artists, result)
     plt.tight_layout()
 
     # ax2.annotate('@Last Update:' + datetime.now().strftime("%d/%m/%Y %H:%M"),
@@ -161,25 +191,27 @@ def plot_(result, mode='1-day', type_='GOES-Long_and_Short', outfile='', in_app=
         fig.savefig(save_path, bbox_inches='tight', dpi=150)
 
     if in_app:
+        import streamlit as st
         st.pyplot(fig)
-    else:
+    elif show:
         plt.show()
 
     return plt
 
 
-def produce_plot(mode='1-day', in_app=False):
+def produce_plot(mode='1-day', in_app=False, outfile=''):
     """
-    Downloads an NOAA GOES SXR NRT JSON file and process it
+    Downloads an NOAA GOES proton NRT JSON file and process it
     into a plot.
     Parameters
     ----------
     mode : `str`
         The mode of json file you want to process
+    outfile : `str`
+        The directory to save the plot in, if given the plot is not shown.
     """
-    data = _parse_json_file(mode)
-    result = _to_dataframe(data)
-    plt = plot_(result, mode, in_app=in_app)
+    result = store.get(mode)
+    plt = plot_(result, mode, outfile=outfile, in_app=in_app, show=outfile == '')
 
     return plt
 
@@ -192,5 +224,7 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-mode', '--mode', default='1-day',
                         choices=['6-hour', '1-day', '3-day', '7-day'])
+    parser.add_argument('-o', '--outfile', default='',
+                        help='directory to save the plot in (instead of showing it)')
     args = parser.parse_args()
-    produce_plot(mode=args.mode)
+    produce_plot(mode=args.mode, outfile=args.outfile)
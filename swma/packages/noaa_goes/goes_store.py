@@ -0,0 +1,230 @@
+"""
+In-memory store of the NOAA GOES near-real-time time series.
+
+SWPC serves the same GOES measurements in files that cover the last 6-hours,
+1-day, 3-days and 7-days. Instead of downloading and parsing each of them, the
+store is seeded once from the 7-day file and is then topped up with the small
+6-hour file: only the rows newer than the last time tag in the store are appended
+and the rows older than the 7-day window are evicted. The shorter modes are
+slices of the store. The new measurements can also be appended to a persistent
+archive on disk (see `goes_archive.Archive`), so that they are kept after they
+leave the 7-day window. The archive is written by a background thread (the
+measurements that arrive during a write are batched in the next one), so an
+update of the store only merges the new rows in memory; see `flush`.
+
+`GoesSeries` builds the store and the archive of a GOES product of the registry,
+and reads any time range of it for a plot.
+
+Examples
+--------
+>>> store = TimeSeriesStore(registry.get('goes_sxr').load)
+>>> result = store.get('1-day')
+>>> series = GoesSeries(registry.get('goes_protons'))
+>>> result = series.query_range('2022-05-01', '2022-05-03')
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from packages.noaa_goes import goes_archive
+from packages.noaa_goes.utils import decimate
+
+LOGGER = logging.getLogger(__name__)
+
+windows = OrderedDict([('6-hour', pd.Timedelta(hours=6)),
+                       ('1-day', pd.Timedelta(days=1)),
+                       ('3-day', pd.Timedelta(days=3)),
+                       ('7-day', pd.Timedelta(days=7))])
+
+# The ranges are read from the archive at the finest resolution with at most this
+# number of points per decimation bin; the min-max decimation reduces the rest, so
+# a range has the detail of the live modes of the same span (e.g. 1-minute for 7 days).
+oversampling = 16
+
+# The archives of all the stores are written by one background thread.
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='swma-archive')
+
+
+def flush(timeout=None):
+    """
+    Waits until the measurements passed to the archives so far are written.
+    """
+    _writer.submit(lambda: None).result(timeout)
+
+
+def _slice(frame, tstart):
+    """
+    Returns the rows of a time-sorted frame that are newer than tstart.
+    """
+    return frame.iloc[frame.index.searchsorted(tstart, side='right'):]
+
+
+class TimeSeriesStore:
+    """
+    A GOES time series kept up to date by appending the latest measurements.
+    Parameters
+    ----------
+    load : `callable`
+        Function that takes a mode (e.g. '7-day') and returns the result tuple
+        (dataframe, metadata, units) of `_to_dataframe` for that file.
+    window : `str`
+        The mode of the file used to seed the store, also the length of the store.
+    tail : `str`
+        The mode of the file used to top up the store.
+    archive : `goes_archive.Archive`
+        The archive the new measurements are appended to, None for no archive.
+    """
+
+    def __init__(self, load, window='7-day', tail='6-hour', archive=None):
+        self._load = load
+        self.window = window
+        self.tail = tail
+        self.archive = archive
+        self._result = None
+        self._tail = None
+        self._lock = threading.Lock()
+        # The frames waiting to be archived, and whether a write is scheduled.
+        self._pending = []
+        self._scheduled = False
+        self._pending_lock = threading.Lock()
+
+    def update(self):
+        """
+        Seeds the store or appends the new measurements of the tail file.
+        Returns the result tuple of the whole window.
+        """
+        with self._lock:
+            if self._result is None:
+                self._result = self._load(self.window)
+                self._archive(self._result[0])
+                return self._result
+            tail = self._load(self.tail)
+            if tail is self._tail:
+                # Same (cached) tail file as in the last update, nothing new.
+                return self._result
+            self._tail = tail
+            frame = self._result[0]
+            if len(frame) == 0 or (len(tail[0]) and tail[0].index[0] > frame.index[-1]):
+                # The tail file does not overlap with the store, so some
+                # measurements are missing; seed the store again.
+                self._result = self._load(self.window)
+                self._archive(self._result[0])
+                return self._result
+            new = _slice(tail[0], frame.index[-1])
+            if len(new):
+                self._archive(new)
+                frame = pd.concat([frame, new])
+                frame = _slice(frame, frame.index[-1] - windows[self.window])
+                self._result = (frame,) + tuple(self._result[1:])
+            return self._result
+
+    def _archive(self, frame):
+        """
+        Queues new measurements to be appended to the archive in the background.
+        """
+        if self.archive is None or len(frame) == 0:
+            return
+        with self._pending_lock:
+            self._pending.append(frame)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        _writer.submit(self._write)
+
+    def _write(self):
+        """
+        Appends the queued measurements to the archive in one batch. A failure
+        of the archive is logged, it never stops the store from being updated.
+        """
+        with self._pending_lock:
+            frames, self._pending = self._pending, []
+            self._scheduled = False
+        try:
+            self.archive.append(pd.concat(frames) if len(frames) > 1 else frames[0])
+        except Exception as error:
+            LOGGER.warning('Archiving %s failed: %s', self.archive.product, error)
+
+    def get(self, mode):
+        """
+        Returns the result tuple (dataframe, metadata, units) for a mode,
+        i.e. the part of the store that is within the mode's time window.
+        """
+        result = self.update()
+        frame = result[0]
+        if mode != self.window and len(frame):
+            frame = _slice(frame, frame.index[-1] - windows[mode])
+        return (frame,) + tuple(result[1:])
+
+    def clear(self):
+        with self._lock:
+            self._result = None
+            self._tail = None
+
+
+class GoesSeries:
+    """
+    The live and archived time series of a GOES product: a store of the 7-day
+    window topped up with the 6-hour file, and the archive of the measurements.
+    Parameters
+    ----------
+    product : `packages.registry.Product`
+        The declaration of the product, its channels are the columns of the results.
+    decimation : `int`
+        The time series are decimated to this number of time bins (about the
+        width of the plot in pixels) before they are plotted, None to plot all
+        the samples. The attribute is the setting of the product, it can be changed.
+    """
+
+    def __init__(self, product, decimation=700):
+        self.product = product
+        self.decimation = decimation
+        # The measurements are kept in a local archive once they leave the 7-day window.
+        self.archive = goes_archive.Archive(product.name)
+        self.store = TimeSeriesStore(product.load, archive=self.archive)
+
+    def load_range(self, tstart, tend):
+        """
+        Reads the measurements between two times from the local archive.
+        Returns the result tuple (dataframe, metadata, units), as `Product.to_dataframe`.
+        """
+        return self.product.result(self.archive.read(tstart, tend, channels=self.product.channels))
+
+    def query_range(self, tstart, tend, points=None):
+        """
+        Returns the measurements between two times for a plot, from the local
+        archive (at the finest resolution that fits the number of points, keeping
+        the peaks) merged with the live measurements of the store. Decimate the
+        result (see `decimate`) to the plot width.
+        Returns the result tuple (dataframe, metadata, units), as `Product.to_dataframe`.
+        Parameters
+        ----------
+        points : `int`
+            The maximum number of points, by default `oversampling` times `decimation`.
+        """
+        try:
+            live = self.store.get(self.store.window)[0]
+        except Exception:
+            # The archive is still available when the live data are not.
+            live = None
+        return self.product.result(goes_archive.query_range(self.archive, self.product.channels, tstart, tend,
+                                                            self.points() if points is None else points,
+                                                            live=live))
+
+    def points(self):
+        """
+        Returns the default maximum number of points of `query_range`, None for all the samples.
+        """
+        return None if self.decimation is None else self.decimation * oversampling
+
+    def decimate(self, result, bins=None):
+        """
+        Decimates the time series of a result to be plotted, keeping the peaks of the flux.
+        Parameters
+        ----------
+        bins : `int`
+            The number of time bins, by default `decimation`.
+        """
+        return (decimate(result[0], self.decimation if bins is None else bins),) + result[1:]
@@ -27,24 +27,24 @@ References
 """
 
 import argparse
-import json
+import functools
 import os
-import urllib.request
 from collections import OrderedDict
 
-import astropy.units as u
-import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
 # from datetime import datetime
 import numpy as np
-import pandas as pd
-import streamlit as st
-from pandas import json_normalize
-from sunpy.time import parse_time
-from sunpy.util.metadata import MetaDict
+from packages import figures, registry
+from packages.noaa_goes import goes_flares
+from packages.noaa_goes.goes_store import GoesSeries, windows
 
-url_sxr = 'https://services.swpc.noaa.gov/json/goes/primary/xrays-?.json'
+# The declaration of the SXR files, see `packages.registry`.
+product = registry.get('goes_sxr')
+# The SXR files are updated every 1-minute.
+ttl = product.ttl
+# The fields read from the JSON file and their dtypes.
+schema = product.schema
+# The wavelength channels, each one becomes a column of the dataframe.
+channels = OrderedDict(zip(['GOES-Long', 'GOES-Short'], product.channels))
 
 
 def _parse_json_file(mode):
@@ -52,112 +52,124 @@ def _parse_json_file(mode):
     Parses an NOAA GOES SXR JSON file.
     Parameters
     ----------
-    filepath : `str`
-        The path or url to the file you want to parse.
+    mode : `str`
+        The mode of the file, e.g. '1-day'.
     """
-    url = (url_sxr).replace('?', mode)
-    with urllib.request.urlopen(url) as fp:
-        data = json.loads(fp.read().decode())
-    return data
+    return product.fetch_json(mode)
 
 
 def _to_dataframe(data):
-    # Convert the json data to Dataframe
-    result = json_normalize(data)
-    rename = {'energy': 'wavelength'}
-    result = result.rename(columns=rename)
-    # Convoluted time index handling
-    result = result.set_index('time_tag')
-    result.index = pd.DatetimeIndex(result.index.values)
-    result.index = pd.DatetimeIndex(parse_time(
-        [x for x in result.index.values]).isot.astype('datetime64'))
-    # Add the units on data.
-    units = OrderedDict([('satellite', u.dimensionless_unscaled),
-                         ('flux', u.W/u.m**2),
-                         ('wavelength', u.nm)])
-    return result, MetaDict(
-        {'comments': 'Merged time serie for 0.1-0.8nm & 0.05-0.4nm wavelengths'}), units
+    # One flux column per wavelength on a common time axis, with units
+    return product.to_dataframe(data)
+
+
+def _result(frame):
+    return product.result(frame)
+
+
+def flares_version(flares):
+    """
+    Returns the version of the flares dataframe, for the cache keys of the figures.
+    """
+    if flares is None or len(flares) == 0:
+        return (0, None, None)
+    return (len(flares), flares.index[-1], flares['max_class'].iloc[-1])
+
+
+def _load(mode):
+    """
+    Downloads an NOAA GOES SXR JSON file and converts it to a dataframe.
+    The result is cached and reused until the file changes on the server.
+    """
+    return product.load(mode)
+
+
+# The 7-day time series topped up with the 6-hour file, and the local archive
+# of the measurements (see `goes_store.GoesSeries`). The time series are decimated
+# to `series.decimation` time bins (about the width of the plot in pixels) before
+# they are plotted, set it to None to plot all the samples.
+series = GoesSeries(product, decimation=700)
+archive = series.archive
+store = series.store
+load_range = series.load_range
+query_range = series.query_range
+_decimate = series.decimate
+
+# The flares found in the long channel flux of the store.
+detector = goes_flares.FlareDetector(windows[store.window])
+
+
+def detect_flares():
+    """
+    Returns the flares found in the long channel flux of the store, indexed by
+    the time of their maximum (see `goes_flares.detect`). Only the minutes added to the
+    store since the last call are scanned, see `goes_flares.FlareDetector`.
+    """
+    return detector.update(store.get(store.window)[0][channels['GOES-Long']])
+
+
+def latest_flare():
+    """
+    Returns the latest flare found in the flux as the records of the SWPC
+    latest flare JSON file: [{'max_class': ..., 'max_time': ...}].
+    """
+    flares = detect_flares()
+    if len(flares) == 0:
+        return [{'max_class': None, 'max_time': None}]
+    flare = flares.iloc[-1]
+    return [{'max_class': flare['max_class'], 'max_time': flare.name.strftime('%Y-%m-%dT%H:%M:%SZ')}]
+
+
+def load(mode, plot_flares=False):
+    """
+    Returns the result tuple of a mode and, if plot_flares is True, the flares
+    found in the flux (None otherwise).
+    """
+    result = store.get(mode)
+    return result, detect_flares() if plot_flares else None
 
 
 def _split_to_data(result, type_):
-    dataframe_ = result[0]
-    if type_ == 'GOES-Long':
-        dataframe = dataframe_[dataframe_['wavelength'] == '0.1-0.8nm']
-    elif type_ == 'GOES-Short':
-        dataframe = dataframe_[dataframe_['wavelength'] == '0.05-0.4nm']
-    else:
-        raise ValueError(f'Got unknown _split type "{type}"')
-    return dataframe
+    if type_ not in channels:
+        raise ValueError(f'Got unknown _split type "{type_}"')
+    return result[0][channels[type_]]
 
 
-def plot_(result, mode='1-day', type_='GOES-Long_and_Short', plot_flares=False, outfile='', in_app=False,
-          **plot_args):
+def _build_figure(fig, type_='GOES-Long_and_Short', **plot_args):
     """
-    Plot the data from the GOES SXR JSON file.
-    Parameters
-    ----------
-    result: dataframe
-    mode : `str`
-        The mode of json file you want to process
+    Draws the parts of the plot that do not depend on the data (the axes, the
+    class levels and their labels) and empty lines for the flux.
+    Returns the artists that are updated with the data, see `_update_figure`.
     """
-    # plt.figure(dpi=150)
-    fig, axes = plt.subplots()
+    import matplotlib.dates as mdates
+    import matplotlib.ticker as mticker
+
     fig.set_size_inches(5.5, 5)
+    axes = fig.add_subplot()
     if type_ == 'GOES-Long_and_Short':
-        dataframe_long = _split_to_data(result, type_='GOES-Long')
-        axes.plot(dataframe_long.index, dataframe_long['flux'],
-                  marker='', color='red',
-                  linewidth=1, label='0.1-0.8nm', **plot_args)
-        dataframe_sort = _split_to_data(result, type_='GOES-Short')
-        axes.plot(dataframe_sort.index, dataframe_sort['flux'],
-                  marker='', color='blue',
-                  linewidth=1, label='0.05-0.4nm', **plot_args)
-    elif type_ == 'GOES-Long':
-        dataframe_long = _split_to_data(result, type_='GOES-Long')
-        axes.plot(dataframe_long.index, dataframe_long['flux'],
-                  marker='', color='red',
-                  linewidth=1, label='0.1-0.8nm', **plot_args)
-    elif type_ == 'GOES-Short':
-        dataframe_sort = _split_to_data(result, type_='GOES-Short')
-        axes.plot(dataframe_sort.index, dataframe_sort['flux'],
-                  marker='', color='blue',
-                  linewidth=1, label='0.05-0.4nm', **plot_args)
+        types = ['GOES-Long', 'GOES-Short']
+    elif type_ in ('GOES-Long', 'GOES-Short'):
+        types = [type_]
     else:
-        raise ValueError(f'Got unknown plot type "{type}"')
+        raise ValueError(f'Got unknown plot type "{type_}"')
+    axes.xaxis_date()
+    lines = OrderedDict()
+    for name in types:
+        color = 'red' if name == 'GOES-Long' else 'blue'
+        lines[name], = axes.plot([], [], marker='', color=color,
+                                 linewidth=1, label=channels[name], **plot_args)
 
-    tstart, tend = result[0].index[0], result[0].index[-1]
     axes.set_title('NOAA - GOES Soft X-Ray Flux (1-minute average)')
     axes.set_xlabel('Time [UT]')
     axes.set_ylabel('Flux [W/m$^2$]')
     axes.set_yscale('log')
     axes.set_ylim([1e-9, 1e-3])
-    axes.set_xlim([tstart, tend])
 
     axes.grid(True, which='minor', linewidth=0.5)
     axes.grid(True, which='major', linewidth=0.5)
     ymin, ymax = axes.get_ylim()
-    xmin, xmax = axes.get_xlim()
     axes.legend(loc='upper left')
 
-    if plot_flares is True:
-        # url = "https://services.swpc.noaa.gov/json/goes/primary/xray-flares-latest.json"
-        url = 'https://services.swpc.noaa.gov/json/goes/primary/xray-flares-7-day.json'
-        with urllib.request.urlopen(url) as url:
-            data_flare = json.loads(url.read().decode())
-        # If we want to add flare information:
-        # Convert the json data to Dataframe
-        result_flare = json_normalize(data_flare)
-
-        for index, flare in result_flare.iterrows():
-            Time_Flare = pd.to_datetime(flare['max_time'], format='%Y-%m-%dT%H:%M:%SZ')
-            if (Time_Flare is not None):
-                if (Time_Flare > tstart):
-                    axes.plot([Time_Flare, Time_Flare], [1e-9, flare['max_xrlong']], marker='',
-                              color='black', linestyle='dashed', linewidth=1, label='Flare')
-                    axes.text(Time_Flare, 1.5*flare['max_xrlong'], flare['max_class'],
-                              horizontalalignment='center',
-                              verticalalignment='center')
-
     # Add a color to the classes limits
     ygrid = axes.get_ygridlines()
     ygrid[2].set_color('blue')
@@ -186,6 +198,67 @@ def plot_(result, mode='1-day', type_='GOES-Long_and_Short', plot_flares=False,
     ax2.yaxis.set_minor_locator(mticker.FixedLocator(centers))
     ax2.set_yticklabels(labels, minor=True)
     ax2.set_yticklabels([])
+    return {'axes': axes, 'lines': lines, 'flares': []}
+
+
+def _update_figure(fig, artists, result, plot_flares=False, flares=None):
+    """
+    Updates the artists of `_build_figure` with new data.
+    """
+    axes = artists['axes']
+    for name, line in artists['lines'].items():
+        flux = _split_to_data(result, type_=name)
+        line.set_data(flux.index.to_numpy(), flux.to_numpy())
+    tstart, tend = result[0].index[0], result[0].index[-1]
+    axes.set_xlim([tstart, tend])
+
+    for artist in artists['flares']:
+        artist.remove()
+    artists['flares'] = []
+    if plot_flares is True:
+        if flares is None:
+            flares = detect_flares()
+        # The flares with a maximum in the plot, drawn as one collection of lines
+        flares = flares[(flares.index > tstart) & (flares.index <= tend)]
+        if len(flares):
+            artists['flares'].append(axes.vlines(flares.index.to_numpy(), 1e-9, flares['max_xrlong'].to_numpy(),
+                                                 colors='black', linestyles='dashed', linewidth=1, label='Flare'))
+        for time, peak, class_ in zip(flares.index, flares['max_xrlong'].to_numpy(), flares['max_class']):
+            artists['flares'].append(axes.text(time, 1.5*peak, class_,
+                                               horizontalalignment='center',
+                                               verticalalignment='center'))
+    # The layout of a template is computed once, without the flares.
+    for artist in artists['flares']:
+        artist.set_in_layout(False)
+
+
+def figure_template(type_='GOES-Long_and_Short'):
+    """
+    Returns a figure of the plot that is built once and updated with new data,
+    see `packages.figures.FigureTemplate`.
+    """
+    return figures.FigureTemplate(functools.partial(_build_figure, type_=type_), _update_figure)
+
+
+def plot_(result, mode='1-day', type_='GOES-Long_and_Short', plot_flares=False, outfile='', in_app=False,
+          show=True, flares=None, **plot_args):
+    """
+    Plot the data from the GOES SXR JSON file.
+    Parameters
+    ----------
+    result: dataframe
+    mode : `str`
+        The mode of json file you want to process
+    flares : `pandas.DataFrame`
+        The flares (see `detect_flares`),
+        found in the flux of the store if None and plot_flares is True.
+    """
+    import matplotlib.pyplot as plt
+
+    # plt.figure(dpi=150)
+    fig = plt.figure()
+    artists = _build_figure(fig, type_, **plot_args)
+    _update_figure(fig, artists, result, plot_flares=plot_flares, flares=flares)
     plt.tight_layout()
     # ax2.annotate('@Last Update:' + datetime.now().strftime("%d/%m/%Y %H:%M"),
     #        xy=(10, 15), xycoords='figure pixels',fontsize=8, color=(0,0,0,0.5))
@@ -195,14 +268,15 @@ def plot_(result, mode='1-day', type_='GOES-Long_and_Short', plot_flares=False,
         fig.savefig(save_path, bbox_inches='tight', dpi=150)
 
     if in_app:
+        import streamlit as st
         st.pyplot(fig)
-    else:
+    elif show:
         plt.show()
 
     return plt
 
 
-def produce_plot(mode='1-day', plot_flares=False, in_app=False):
+def produce_plot(mode='1-day', plot_flares=False, in_app=False, outfile=''):
     """
     Downloads an NOAA GOES SXR NRT JSON file and process it
     into a plot.
@@ -210,10 +284,12 @@ def produce_plot(mode='1-day', plot_flares=False, in_app=False):
     ----------
     mode : `str`
         The mode of json file you want to process
+    outfile : `str`
+        The directory to save the plot in, if given the plot is not shown.
     """
-    data = _parse_json_file(mode)
-    result = _to_dataframe(data)
-    plt = plot_(result, mode, plot_flares=plot_flares, in_app=in_app)
+    result, flares = load(mode, plot_flares)
+    plt = plot_(result, mode, plot_flares=plot_flares, outfile=outfile, in_app=in_app,
+                show=outfile == '', flares=flares)
 
     return plt
 
@@ -226,5 +302,9 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-mode', '--mode', default='1-day',
                         choices=['6-hour', '1-day', '3-day', '7-day'])
+    parser.add_argument('-f', '--flares', action='store_true',
+                        help='plot the latest flares')
+    parser.add_argument('-o', '--outfile', default='',
+                        help='directory to save the plot in (instead of showing it)')
     args = parser.parse_args()
-    produce_plot(mode=args.mode)
+    produce_plot(mode=args.mode, plot_flares=args.flares, outfile=args.outfile)
@@ -0,0 +1,179 @@
+"""
+Helper functions shared by the NOAA GOES JSON modules.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def parse_time_tag(values):
+    """
+    Converts the ISO-8601 time tags of the SWPC JSON files (e.g.
+    '2022-05-01T00:00:00Z', or '2022-05-01' for the daily products) to a
+    time index in one vectorized pass.
+    Parameters
+    ----------
+    values : array-like of `str`
+        The time tags as they are read from the JSON file.
+    Returns
+    -------
+    `pandas.DatetimeIndex`
+        Time-zone naive index in UTC with datetime64[ns] values.
+    """
+    index = pd.to_datetime(values, format='ISO8601', utc=True)
+    return pd.DatetimeIndex(index.tz_localize(None)).as_unit('ns')
+
+
+def records_to_frame(data, schema, index='time_tag'):
+    """
+    Builds a dataframe from the flat list of homogeneous records of an SWPC
+    JSON file, one typed column at a time (no `pandas.json_normalize`).
+    Parameters
+    ----------
+    data : `list` of `dict`
+        The decoded JSON file.
+    schema : `OrderedDict`
+        The columns to read and their dtypes. Use 'category' for the
+        columns with repeated strings (e.g. the energy channel).
+        The fields of the records that are not in the schema are dropped.
+    index : `str`
+        The column with the time tags used as the time index.
+    Returns
+    -------
+    `pandas.DataFrame`
+    """
+    columns = OrderedDict()
+    for name, dtype in schema.items():
+        if name == index:
+            continue
+        values = [record.get(name) for record in data]
+        if dtype == 'category':
+            columns[name] = pd.Categorical(values)
+        else:
+            columns[name] = np.array(values, dtype=dtype)
+    time_index = parse_time_tag([record[index] for record in data])
+    return pd.DataFrame(columns, index=time_index)
+
+
+def table_to_frame(data, schema, index='time_tag', after=None):
+    """
+    Builds a dataframe from an SWPC products table: a header row followed by
+    rows of strings, sorted by time (e.g. the solar wind and Kp products).
+    Parameters
+    ----------
+    data : `list` of `list`
+        The decoded JSON file.
+    schema : `OrderedDict`
+        The columns to read and their dtypes, the values that cannot be
+        converted (e.g. null) are NaN.
+    index : `str`
+        The column with the time tags used as the time index.
+    after : `pandas.Timestamp`
+        Only the rows after this time are converted, the table is read backward
+        from its end so the older rows are not scanned.
+    Returns
+    -------
+    `pandas.DataFrame`
+    """
+    header, rows = data[0], data[1:]
+    time = header.index(index)
+    first = 0
+    if after is not None:
+        first = len(rows)
+        while first > 0 and pd.Timestamp(rows[first - 1][time]) > after:
+            first -= 1
+    rows = rows[first:]
+    columns = OrderedDict()
+    for name, dtype in schema.items():
+        if name == index:
+            continue
+        field = header.index(name)
+        columns[name] = pd.to_numeric([row[field] for row in rows], errors='coerce').astype(dtype)
+    return pd.DataFrame(columns, index=parse_time_tag([row[time] for row in rows]))
+
+
+def pivot_channels(frame, channel, value='flux', channels=None):
+    """
+    Pivots a frame with one row per time and channel (e.g. energy) to a wide
+    time-indexed frame with one column per channel. Each channel column is
+    backed by a contiguous float array and all the channels share the same
+    time axis (missing measurements are NaN).
+    Parameters
+    ----------
+    frame : `pandas.DataFrame`
+        The frame from `records_to_frame`, its channel column is categorical.
+    channel : `str`
+        The column with the channel names.
+    value : `str`
+        The column with the measurements.
+    channels : `list`
+        The order of the channel columns, the channels that are not listed
+        are added after them.
+    Returns
+    -------
+    `pandas.DataFrame`
+        Frame with the 'satellite' column (if any) and one column per channel.
+    """
+    names = list(frame[channel].cat.categories)
+    if channels is not None:
+        names = [c for c in channels if c in names] + [c for c in names if c not in channels]
+    codes = frame[channel].cat.codes.to_numpy()
+    order = np.array([names.index(c) for c in frame[channel].cat.categories], dtype=np.intp)
+    times, time_idx = np.unique(frame.index.values, return_inverse=True)
+    values = np.full((len(names), len(times)), np.nan)
+    valid = codes >= 0
+    values[order[codes[valid]], time_idx[valid]] = frame[value].to_numpy()[valid]
+    columns = OrderedDict()
+    if 'satellite' in frame:
+        satellite = np.zeros(len(times), dtype=frame['satellite'].dtype)
+        satellite[time_idx] = frame['satellite'].to_numpy()
+        columns['satellite'] = satellite
+    for i, name in enumerate(names):
+        columns[name] = values[i]
+    return pd.DataFrame(columns, index=pd.DatetimeIndex(times))
+
+
+def decimate(frame, bins, columns=None):
+    """
+    Min-max decimation of a time series before it is plotted. The time range is
+    split in equal bins (about one per pixel of the plot) and, for each channel,
+    only the samples with the minimum and the maximum of every bin are kept,
+    so the peaks (e.g. the flare maxima) are kept with their exact flux and
+    time and the plotted lines look the same.
+    Parameters
+    ----------
+    frame : `pandas.DataFrame`
+        A time-indexed frame with one column per channel (see `pivot_channels`).
+    bins : `int`
+        The number of time bins, None to keep all the samples.
+    columns : `list`
+        The channels to decimate, by default all the float columns.
+    Returns
+    -------
+    `pandas.DataFrame`
+        The rows of the frame that are the extrema of any channel in their
+        bin, and the first and the last rows. A row with a missing value is kept
+        in each bin that has one, so the gaps of the lines are kept.
+    """
+    if bins is None or len(frame) <= 2 * bins:
+        return frame
+    if columns is None:
+        columns = [name for name in frame.columns if frame[name].dtype.kind == 'f']
+    time = frame.index.asi8
+    span = max(time[-1] - time[0], 1)
+    bin_ = np.minimum(((time - time[0]) / span * bins).astype(np.int64), bins - 1)
+    keep = [np.array([0, len(frame) - 1])]
+    for name in columns:
+        values = frame[name].to_numpy()
+        valid = ~np.isnan(values)
+        index = np.flatnonzero(valid)
+        # Sorted by bin, then by value: the first and the last of a bin are its extrema.
+        order = index[np.lexsort((values[index], bin_[index]))]
+        first = np.flatnonzero(np.r_[True, bin_[order][1:] != bin_[order][:-1]])
+        last = np.r_[first[1:], len(order)] - 1
+        keep += [order[first], order[last]]
+        gaps = np.flatnonzero(~valid)
+        keep.append(gaps[np.unique(bin_[gaps], return_index=True)[1]])
+    return frame.iloc[np.unique(np.concatenate(keep))]
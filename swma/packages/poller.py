@@ -0,0 +1,251 @@
+"""
+Background poller that keeps the data products warm independently of the user traffic.
+
+Each source (a function that downloads and parses a product) is polled on its
+own cadence, with a random jitter so that the sources do not hit the servers at
+the same time. The polls run in a small thread pool, so a slow or failing source
+does not delay the others; a failing source is retried with an exponential
+backoff. The polls are made within `packages.fetch.revalidate`, so the shared
+caches (and the GOES time series stores) are refreshed before their ttl expires
+and the Streamlit sessions only read from memory. The latest value of every
+source is also published in the poller, see `Poller.get`.
+
+Only a poller that runs in the process of the Streamlit application warms the
+pages: set the environment variable SWMA_POLLER=1 and the sessions share its
+caches and stores. The poller can also run as a separate process (run it from
+the directory of swma.py):
+
+    python -m packages.poller -v
+
+but its caches and stores live in its own memory, nothing is published to the
+Streamlit process. A separate poller only keeps the local archive of the GOES
+measurements filled (see `goes_archive`, read by the custom ranges of the
+application) and sends the alerts (see `packages.alerts`).
+"""
+
+import argparse
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from packages import fetch
+
+LOGGER = logging.getLogger(__name__)
+
+# Relative jitter of the polling times.
+jitter = 0.1
+# Maximum backoff of a failing source (in units of its cadence).
+max_backoff = 8
+
+
+class Source:
+    """
+    A product polled on its own cadence.
+    Parameters
+    ----------
+    name : `str`
+        The name of the source.
+    poll : `callable`
+        Function without arguments that downloads and returns the product.
+    cadence : `float`
+        The polling period in seconds.
+    """
+
+    def __init__(self, name, poll, cadence):
+        self.name = name
+        self.poll = poll
+        self.cadence = cadence
+        self.value = None
+        # Time (time.time) of the last successful poll.
+        self.updated = None
+        self.failures = 0
+        self.error = None
+
+
+class Poller:
+    """
+    Polls a set of sources in the background.
+    Parameters
+    ----------
+    sources : `list` of `Source`
+    max_workers : `int`
+        Number of sources that can be polled at the same time.
+    seed : `int`
+        Seed of the random jitter.
+    """
+
+    def __init__(self, sources=(), max_workers=4, seed=None):
+        self.sources = OrderedDict((source.name, source) for source in sources)
+        self.max_workers = max_workers
+        self._random = random.Random(seed)
+        self._queue = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopped = True
+        self._thread = None
+        self._executor = None
+
+    def add(self, source):
+        with self._lock:
+            self.sources[source.name] = source
+            if not self._stopped:
+                self._schedule(source, self._random.uniform(0, jitter) * source.cadence)
+
+    def get(self, name):
+        """
+        Returns the latest value of a source (None if it has not been polled yet).
+        """
+        return self.sources[name].value
+
+    def status(self):
+        """
+        Returns (time of the last successful poll, number of consecutive failures,
+        last error) for each source.
+        """
+        return OrderedDict((name, (source.updated, source.failures, source.error))
+                           for name, source in self.sources.items())
+
+    def poll(self, name):
+        """
+        Polls a source now and publishes its value. The errors are logged and
+        recorded in the source, they never propagate to the caller.
+        Returns True if the poll succeeded.
+        """
+        source = self.sources[name]
+        try:
+            with fetch.revalidate():
+                value = source.poll()
+        except Exception as error:
+            source.failures += 1
+            source.error = error
+            LOGGER.warning('Polling %s failed (%d): %s', name, source.failures, error)
+            return False
+        source.value = value
+        source.updated = time.time()
+        source.failures = 0
+        source.error = None
+        return True
+
+    def delay(self, source):
+        """
+        Returns the jittered delay until the next poll of a source.
+        """
+        delay = source.cadence
+        if source.failures:
+            delay = source.cadence * min(2 ** (source.failures - 1), max_backoff)
+        return delay * (1 + self._random.uniform(-jitter, jitter))
+
+    def _schedule(self, source, delay):
+        heapq.heappush(self._queue, (time.monotonic() + delay, next(self._counter), source.name))
+        self._wakeup.notify()
+
+    def _poll_and_reschedule(self, name):
+        self.poll(name)
+        with self._lock:
+            if not self._stopped and name in self.sources:
+                self._schedule(self.sources[name], self.delay(self.sources[name]))
+
+    def _run(self):
+        with self._lock:
+            while not self._stopped:
+                if not self._queue:
+                    self._wakeup.wait()
+                    continue
+                due, _, name = self._queue[0]
+                now = time.monotonic()
+                if due > now:
+                    self._wakeup.wait(due - now)
+                    continue
+                heapq.heappop(self._queue)
+                self._executor.submit(self._poll_and_reschedule, name)
+
+    def start(self):
+        """
+        Starts polling in a background (daemon) thread. The first polls of the
+        sources are spread over a fraction of their cadence.
+        """
+        with self._lock:
+            if not self._stopped:
+                return
+            self._stopped = False
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='swma-poller')
+            for source in self.sources.values():
+                self._schedule(source, self._random.uniform(0, jitter) * source.cadence)
+            self._thread = threading.Thread(target=self._run, name='swma-poller', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.clear()
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=False)
+
+
+def default_sources():
+    """
+    Returns the sources of the products shown by the application. Each one is
+    polled a bit more often than its ttl, so that it is refreshed before it expires.
+    """
+    from packages import alerts, registry
+    from packages.noaa_goes import (goes_prop_json, goes_protons_json,
+                                    goes_sxr_json)
+
+    def cadence(ttl):
+        return ttl * (1 - jitter)
+
+    sources = [
+        Source('goes_sxr', goes_sxr_json.store.update, cadence(goes_sxr_json.ttl)),
+        Source('goes_sxr_flares', goes_sxr_json.detect_flares, cadence(goes_sxr_json.ttl)),
+        Source('goes_protons', goes_protons_json.store.update, cadence(goes_protons_json.ttl)),
+        Source('solar_probabilities', goes_prop_json._load, cadence(goes_prop_json.ttl)),
+    ]
+    # The SWPC tables of the sidebar panels (see `caching.feeds`)
+    for name, product in registry.products.items():
+        if product.format == 'table':
+            sources.append(Source(name, product.fetch_json, cadence(product.ttl)))
+    # The alerts are checked on the samples the other sources have just downloaded.
+    sources.append(Source('alerts', alerts.default_engine().check, cadence(60)))
+    return sources
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def start_default():
+    """
+    Starts (once per process) the poller of the default sources and returns it.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Poller(default_sources())
+            _default.start()
+    return _default
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Poll the SWMA data products to fill the GOES archive and send '
+                                                 'the alerts (set SWMA_POLLER=1 to warm the application instead).')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(name)s %(levelname)s: %(message)s')
+    poller = start_default()
+    try:
+        while True:
+            time.sleep(60)
+            LOGGER.info('Status: %s', dict(poller.status()))
+    except KeyboardInterrupt:
+        poller.stop()
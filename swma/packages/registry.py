@@ -0,0 +1,204 @@
+"""
+Registry of the data products of SWMA.
+
+Each product declares where and how often it is downloaded and how it is read:
+its url (a template with a ``{mode}`` field for the products made of several
+files, e.g. the 6-hour to 7-day GOES files), its modes, its freshness time (ttl),
+the fields of its JSON file and their dtypes, the field with the channel names
+(each channel becomes a column, see `~packages.noaa_goes.utils.pivot_channels`)
+and the units of its columns. `Product` is the generic engine that downloads
+(through the shared caches of `packages.fetch`), parses and pivots every product,
+so an improvement of the engine applies to all the products at once.
+
+The declarations do not import any heavy package: the units are strings that
+are converted to `astropy.units` only when a result is built.
+
+Examples
+--------
+>>> from packages import registry
+>>> result = registry.get('goes_sxr').load('1-day')
+>>> data = registry.get('kp').fetch_json()
+"""
+
+import json
+from collections import OrderedDict
+
+from packages import fetch
+from packages.noaa_goes.utils import (pivot_channels, records_to_frame,
+                                      table_to_frame)
+
+swpc = 'https://services.swpc.noaa.gov'
+
+
+class Product:
+    """
+    The declaration of a data product.
+    Parameters
+    ----------
+    name : `str`
+        The name of the product in the registry.
+    url : `str`
+        The url, or a template with a ``{mode}`` field.
+    ttl : `float`
+        The freshness time of the product in seconds.
+    schema : `OrderedDict`
+        The fields read from the JSON file and their dtypes (see `records_to_frame`).
+    modes : `tuple`
+        The modes of the url template, None if the mode is free (e.g. an image name).
+    index : `str`
+        The field with the time tags.
+    format : `str`
+        'records' for a list of JSON objects, 'table' for a header row and rows
+        of values (the SWPC products), 'image' for an encoded image.
+    channel : `str`
+        The field with the channel names, None if there is one row per time.
+    channels : `list`
+        The order of the channel columns.
+    value : `str`
+        The field with the measurements of the channels.
+    units : `OrderedDict`
+        The units of the columns (strings parsed by `astropy.units.Unit`), the
+        channel columns have the unit ``unit``. If None the product is parsed
+        to a dataframe, otherwise to a (dataframe, metadata, units) tuple.
+    unit : `str`
+        The unit of the channel columns.
+    meta : `dict`
+        The metadata of the result.
+    """
+
+    def __init__(self, name, url, ttl, schema=None, modes=None, index='time_tag', format='records',
+                 channel=None, channels=None, value='flux', units=None, unit=None, meta=None):
+        self.name = name
+        self.url = url
+        self.ttl = ttl
+        self.schema = schema
+        self.modes = modes
+        self.index = index
+        self.format = format
+        self.channel = channel
+        self.channels = channels
+        self.value = value
+        self.units = units
+        self.unit = unit
+        self.meta = meta or {}
+
+    def url_for(self, mode=None):
+        if self.modes is not None and mode not in self.modes:
+            raise ValueError(f'Got unknown mode "{mode}" for {self.name}')
+        return self.url.format(mode=mode)
+
+    def fetch_json(self, mode=None):
+        """
+        Returns the decoded JSON file of a mode, from the cache while it is fresh.
+        """
+        return fetch.fetch_json(self.url_for(mode), ttl=self.ttl)
+
+    def to_frame(self, data, after=None):
+        """
+        Converts the decoded JSON file to a time-indexed dataframe, with one
+        column per channel.
+        Parameters
+        ----------
+        after : `pandas.Timestamp`
+            For the tables, only the rows after this time are converted.
+        """
+        if self.format == 'table':
+            return table_to_frame(data, self.schema, self.index, after=after)
+        frame = records_to_frame(data, self.schema, index=self.index)
+        if self.channel is not None:
+            frame = pivot_channels(frame, self.channel, self.value, channels=self.channels)
+        return frame
+
+    def result(self, frame):
+        """
+        Returns the result of a dataframe: the dataframe itself, or the tuple
+        (dataframe, metadata, units) of the products with units.
+        """
+        if self.units is None:
+            return frame
+        # The time series packages are imported only by the products that need them.
+        import astropy.units as u
+        from sunpy.util.metadata import MetaDict
+
+        units = OrderedDict((name, u.Unit(unit)) for name, unit in self.units.items())
+        units.update((name, u.Unit(self.unit)) for name in frame.columns if name not in units)
+        return frame, MetaDict(self.meta), units
+
+    def to_dataframe(self, data):
+        return self.result(self.to_frame(data))
+
+    def _parse(self, content):
+        return self.to_dataframe(json.loads(content))
+
+    def load(self, mode=None):
+        """
+        Downloads the file of a mode and converts it, see `to_dataframe`
+        (the encoded image for the image products).
+        The result is cached and reused until the file changes on the server.
+        """
+        if self.format == 'image':
+            from packages import images
+            return images.load_image(self.url_for(mode), self.ttl)
+        return fetch.fetch_cached(self.url_for(mode), self.ttl, parse=self._parse)
+
+
+products = OrderedDict()
+
+
+def register(product):
+    products[product.name] = product
+    return product
+
+
+def get(name):
+    """
+    Returns the declaration of a product.
+    """
+    return products[name]
+
+
+# The modes of the GOES time series files.
+goes_modes = ('6-hour', '1-day', '3-day', '7-day')
+# The fields of the GOES time series files, one row per time and channel.
+goes_schema = OrderedDict([('time_tag', 'datetime64[ns]'),
+                           ('satellite', 'int16'),
+                           ('flux', 'float64'),
+                           ('energy', 'category')])
+
+# The GOES files are updated every 1-minute.
+register(Product('goes_sxr', swpc + '/json/goes/primary/xrays-{mode}.json', 60, goes_schema, goes_modes,
+                 channel='energy', channels=['0.1-0.8nm', '0.05-0.4nm'],
+                 units=OrderedDict([('satellite', '')]), unit='W / m2',
+                 meta={'comments': 'Merged time serie for 0.1-0.8nm & 0.05-0.4nm wavelengths'}))
+register(Product('goes_protons', swpc + '/json/goes/primary/integral-protons-{mode}.json', 60, goes_schema,
+                 goes_modes, channel='energy',
+                 channels=['>=1 MeV', '>=10 MeV', '>=50 MeV', '>=100 MeV', '>=500 MeV'],
+                 units=OrderedDict([('satellite', '')]), unit='1 / (cm2 s sr)',
+                 meta={'comments': 'Merged time serie for 0.1-0.8nm & 0.05-0.4nm wavelengths'}))
+# The solar probabilities are updated daily, revalidate them hourly.
+register(Product('solar_probabilities', swpc + '/json/solar_probabilities.json', 3600,
+                 OrderedDict([('date', 'datetime64[ns]')] +
+                             [(f'{event}_{day}_day', 'float64')
+                              for event in ('c_class', 'm_class', 'x_class', '10mev_protons')
+                              for day in (1, 2, 3)] +
+                             [('polar_cap_absorption', 'category')]),
+                 index='date'))
+# The 5-minute solar wind products are enough to read the latest values.
+register(Product('solar_wind_plasma', swpc + '/products/solar-wind/plasma-5-minute.json', 60,
+                 OrderedDict([('density', 'float64'), ('speed', 'float64'), ('temperature', 'float64')]),
+                 format='table'))
+register(Product('solar_wind_mag', swpc + '/products/solar-wind/mag-5-minute.json', 60,
+                 OrderedDict([('bx_gsm', 'float64'), ('by_gsm', 'float64'), ('bz_gsm', 'float64'),
+                              ('bt', 'float64')]),
+                 format='table'))
+register(Product('kp', swpc + '/products/noaa-planetary-k-index.json', 300,
+                 OrderedDict([('Kp', 'float64')]), format='table'))
+# The SDO and SoHO "latest" images are updated every few minutes, the cadence
+# of the LASCO images is around 4 to 5 images per hour.
+register(Product('sdo_latest', 'https://sdo.gsfc.nasa.gov/assets/img/latest/{mode}', 300, format='image'))
+register(Product('hmi_harps', 'http://jsoc.stanford.edu/data/hmi/HARPs_images/latest_nrt.png', 300,
+                 format='image'))
+register(Product('lasco_c2', 'https://sohowww.nascom.nasa.gov/data/realtime/c2/1024/latest.jpg', 600,
+                 format='image'))
+register(Product('lasco_c3', 'https://sohowww.nascom.nasa.gov/data/realtime/c3/1024/latest.jpg', 600,
+                 format='image'))
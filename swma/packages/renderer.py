@@ -0,0 +1,192 @@
+"""
+Headless batch renderer of the data product figures.
+
+All the products and modes shown by the application (the GOES SXR flux with
+and without the flares, the GOES proton flux and the NOAA flare probabilities)
+are rendered to PNG files in an output directory, in this process or in a pool
+of worker processes (see `packages.farm`). Every product is downloaded once per
+run and its data are reused for all its modes (the GOES time series are sliced
+from their stores and decimated to the width of the plots). The files are
+written atomically (to a temporary file that is then renamed), so a web server
+(or the Streamlit application) never serves a partially written image, and a
+file is written again only when its data have changed.
+
+The renderer should run with a non-interactive matplotlib backend, see the
+``render`` command of swma/cli.py.
+"""
+
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict, namedtuple
+
+from packages import figures
+from packages.farm import RenderFarm
+
+LOGGER = logging.getLogger(__name__)
+
+modes = ('6-hour', '1-day', '3-day', '7-day')
+prop_modes = ('c_class', 'm_class', 'x_class', '10mev_protons')
+
+# A figure to render: the name of its file, its cache key (see `figures.cached_png`),
+# the module-level function that draws it, its data and other arguments, the
+# time (`time.monotonic`) until which it should be rendered and, if the plot has
+# one, the key and the factory of its template (see `figures.template`).
+_Job = namedtuple('Job', ['filename', 'key', 'plot', 'result', 'kwargs', 'deadline', 'template'],
+                  defaults=[None])
+
+
+class Job(_Job):
+    __slots__ = ()
+
+    @property
+    def cost(self):
+        return len(self.result[0] if isinstance(self.result, tuple) else self.result)
+
+    def build(self):
+        return self.plot(self.result, show=False, **self.kwargs)
+
+    def render(self):
+        """
+        Returns the PNG bytes of the figure.
+        """
+        if self.template is None:
+            return figures.cached_png(self.key, self.build)
+        return figures.cached_template_png(self.key, figures.template(*self.template), self.result, **self.kwargs)
+
+
+def _sxr_jobs(flares=True):
+    from packages.noaa_goes import goes_sxr_json
+
+    deadline = time.monotonic() + goes_sxr_json.ttl
+    results = OrderedDict((mode, goes_sxr_json.store.get(mode)) for mode in modes)
+    # The flares are found in the flux of the store
+    data_flare = goes_sxr_json.detect_flares() if flares else None
+    for mode, result in results.items():
+        version = figures.data_version(result[0])
+        result = goes_sxr_json._decimate(result)
+        yield Job(f'GOES_SXR_latest_{mode}.png', ('goes_sxr', mode, False, version),
+                  goes_sxr_json.plot_, result, {}, deadline,
+                  (('goes_sxr', mode, False), goes_sxr_json.figure_template))
+        if flares:
+            yield Job(f'GOES_SXR_latest_{mode}_flares.png',
+                      ('goes_sxr', mode, True, version, goes_sxr_json.flares_version(data_flare)),
+                      goes_sxr_json.plot_, result, {'plot_flares': True, 'flares': data_flare}, deadline,
+                      (('goes_sxr', mode, True), goes_sxr_json.figure_template))
+
+
+def _proton_jobs():
+    from packages.noaa_goes import goes_protons_json
+
+    deadline = time.monotonic() + goes_protons_json.ttl
+    for mode in modes:
+        result = goes_protons_json.store.get(mode)
+        version = figures.data_version(result[0])
+        result = goes_protons_json._decimate(result)
+        yield Job(f'GOES_PROTONS_latest_{mode}.png', ('goes_protons', mode, version),
+                  goes_protons_json.plot_, result, {}, deadline,
+                  (('goes_protons', mode), goes_protons_json.figure_template))
+
+
+def _prop_jobs():
+    from packages.noaa_goes import goes_prop_json
+
+    deadline = time.monotonic() + goes_prop_json.ttl
+    result = goes_prop_json._load()
+    version = figures.data_version(result)
+    yield Job('NOAA_latest_prop_all.png', ('solar_probabilities', 'all', version),
+              goes_prop_json.plot_latest_prop_all, result, {}, deadline)
+    for mode in prop_modes:
+        yield Job(f'NOAA_prop_timeline_{mode}.png', ('solar_probabilities', mode, version),
+                  goes_prop_json.plot_prop_timeline, result, {'mode': mode}, deadline)
+
+
+def products(flares=True):
+    """
+    Returns the job generators of the products, by name.
+    """
+    return OrderedDict([('goes_sxr', lambda: _sxr_jobs(flares)),
+                        ('goes_protons', _proton_jobs),
+                        ('solar_probabilities', _prop_jobs)])
+
+
+def write_atomic(path, content):
+    """
+    Writes bytes to a file through a temporary file in the same directory,
+    so that readers see either the old or the new file.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class Renderer:
+    """
+    Renders the figures of the products to an output directory.
+    Parameters
+    ----------
+    outdir : `str`
+        The output directory, it is created if needed.
+    flares : `bool`
+        Also render the GOES SXR figures with the flares.
+    workers : `int`
+        The number of worker processes, the figures are rendered in this
+        process if it is 1 (or 0).
+    """
+
+    def __init__(self, outdir, flares=True, workers=1):
+        self.outdir = outdir
+        self.flares = flares
+        self.farm = RenderFarm(workers) if workers > 1 else None
+        # Cache key of the last written version of every file.
+        self._written = {}
+
+    def render(self):
+        """
+        Renders all the products once. A product that fails (e.g. it cannot be
+        downloaded) is logged and skipped, the files of the others are still written.
+        Returns
+        -------
+        `dict`
+            filename -> True if the file was written, False if it was unchanged
+            (or it was not rendered).
+        """
+        os.makedirs(self.outdir, exist_ok=True)
+        written = OrderedDict()
+        jobs = []
+        for name, product_jobs in products(self.flares).items():
+            try:
+                for job in product_jobs():
+                    written[job.filename] = False
+                    if self._changed(job):
+                        if self.farm is None:
+                            self._write(job, job.render())
+                            written[job.filename] = True
+                        else:
+                            jobs.append(job)
+            except Exception as error:
+                LOGGER.warning('Rendering %s failed: %s', name, error)
+        if jobs:
+            for job, png in self.farm.render(jobs):
+                self._write(job, png)
+                written[job.filename] = True
+        return written
+
+    def close(self):
+        if self.farm is not None:
+            self.farm.shutdown()
+
+    def _changed(self, job):
+        path = os.path.join(self.outdir, job.filename)
+        return self._written.get(job.filename) != job.key or not os.path.exists(path)
+
+    def _write(self, job, png):
+        write_atomic(os.path.join(self.outdir, job.filename), png)
+        self._written[job.filename] = job.key
@@ -20,10 +20,13 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 
+import os
+
+import caching
 import streamlit as st
 import tools
 from config import app_styles
-from modules import current_conditions
+from modules import current_conditions, fetch_conditions
 from streamlit.logger import get_logger
 
 LOGGER = get_logger(__name__)
@@ -43,11 +46,18 @@ def run():
     # HTML Styles
     app_styles.apply(st)
 
+    #############################################################
+    # Keep the data products warm in the background (optional)
+    if os.environ.get('SWMA_POLLER', '0') == '1':
+        caching.start_poller()
+
     #############################################################
     # Start Main
     st.sidebar.title('Space Weather Monitor Application 🚀')
     tool_name = st.sidebar.selectbox('Choose a Tool from the list', list(tools.TOOLS.keys()), 0)
     tool = tools.TOOLS[tool_name][0]
+    # Download the sidebar conditions while the tool is running
+    conditions = fetch_conditions()
 
     if tool_name == '—':
         st.write('# Welcome to Space Weather Monitor Application!')
@@ -63,7 +73,7 @@ def run():
 
     tool()
 
-    current_conditions(st)
+    current_conditions(st, conditions)
 
 
 if __name__ == '__main__':
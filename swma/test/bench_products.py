@@ -0,0 +1,215 @@
+"""
+Benchmarks of the ingest, transform and render steps of the data products.
+
+Each step is timed separately for every product and mode: the decoding of the
+JSON file, its conversion to a dataframe, the channel split and the decimation
+of the GOES series, the drawing of the figure (``plot_``) and its rendering to
+PNG (``savefig``). The files are generated with a fixed seed in the layout and
+at the size of the SWPC files (e.g. 10080 minutes of two SXR channels for the
+7-day mode), so the timings of different commits are comparable.
+
+The benchmarks need pytest-benchmark and are not collected by the test suite,
+run them from the swma directory with:
+
+    python -m pytest test/bench_products.py --benchmark-autosave
+
+and compare a later commit with the saved run with ``--benchmark-compare``.
+"""
+import json
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+from packages import figures, registry
+from packages.noaa_goes import goes_prop_json, goes_protons_json, goes_sxr_json
+
+matplotlib.use('Agg')
+
+# The end of the generated files, and the number of minutes of the GOES modes.
+end = pd.Timestamp('2024-05-10T00:00')
+minutes = {'6-hour': 360, '1-day': 1440, '3-day': 4320, '7-day': 10080}
+tables = ['solar_wind_plasma', 'solar_wind_mag', 'kp']
+
+
+def _time_tags(periods, freq, format='%Y-%m-%dT%H:%M:%SZ'):
+    return pd.date_range(end=end, periods=periods, freq=freq).strftime(format)
+
+
+def _sxr_file(n, seed=0):
+    """
+    The records of an SXR file: a B-class background with a few flares.
+    """
+    rng = np.random.default_rng(seed)
+    background = 5e-7 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    flares = np.zeros(n)
+    for start in rng.integers(0, n, max(1, n // 1440)):
+        profile = 10 ** rng.uniform(-6, -4) * np.exp(-np.arange(n - start) / 30.)
+        flares[start:] += profile * (1 - np.exp(-np.arange(n - start) / 5.))
+    records = []
+    for time_tag, long, short in zip(_time_tags(n, 'min'), background + flares, (background + flares) / 20):
+        for energy, flux in (('0.05-0.4nm', short), ('0.1-0.8nm', long)):
+            records.append({'time_tag': time_tag, 'satellite': 16, 'flux': flux, 'observed_flux': flux,
+                            'electron_correction': 0.0, 'electron_contaminaton': False, 'energy': energy})
+    return records
+
+
+def _protons_file(n, seed=1):
+    rng = np.random.default_rng(seed)
+    levels = [('>=1 MeV', 1.0), ('>=10 MeV', 0.3), ('>=50 MeV', 0.1), ('>=100 MeV', 0.05), ('>=500 MeV', 0.01)]
+    flux = {energy: level * np.exp(rng.normal(0, 0.2, n)) for energy, level in levels}
+    return [{'time_tag': time_tag, 'satellite': 18, 'flux': flux[energy][i], 'energy': energy}
+            for i, time_tag in enumerate(_time_tags(n, 'min')) for energy, _ in levels]
+
+
+def _probabilities_file(n=30, seed=2):
+    rng = np.random.default_rng(seed)
+    return [dict({'date': date, 'polar_cap_absorption': 'green'},
+                 **{f'{event}_{day}_day': int(rng.integers(1, 99))
+                    for event in ('c_class', 'm_class', 'x_class', '10mev_protons') for day in (1, 2, 3)})
+            for date in _time_tags(n, 'D', '%Y-%m-%d')]
+
+
+def _table_file(header, n, freq, seed=3):
+    """
+    An SWPC products table: a header row and rows of strings.
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0, 5, (n, len(header) - 1))
+    return [header] + [[time_tag] + [f'{value:.2f}' for value in row]
+                       for time_tag, row in zip(_time_tags(n, freq, '%Y-%m-%d %H:%M:%S.000'), values)]
+
+
+@pytest.fixture(scope='module')
+def swpc_files():
+    """
+    The encoded JSON files of the products, by (product, mode).
+    """
+    files = {}
+    for mode, n in minutes.items():
+        files['goes_sxr', mode] = _sxr_file(n)
+        files['goes_protons', mode] = _protons_file(n)
+    files['solar_probabilities', None] = _probabilities_file()
+    # The 1-minute solar wind tables of a day and the 3-hour Kp table of a week
+    files['solar_wind_plasma', None] = _table_file(['time_tag', 'density', 'speed', 'temperature'], 1440, 'min')
+    files['solar_wind_mag', None] = _table_file(['time_tag', 'bx_gsm', 'by_gsm', 'bz_gsm', 'lon_gsm', 'lat_gsm',
+                                                 'bt'], 1440, 'min')
+    files['kp', None] = _table_file(['time_tag', 'Kp', 'a_running', 'station_count'], 56, '3h')
+    return {key: json.dumps(data).encode() for key, data in files.items()}
+
+
+goes_modules = {'goes_sxr': goes_sxr_json, 'goes_protons': goes_protons_json}
+goes_cases = [(name, mode) for name in goes_modules for mode in minutes]
+# The channel of each GOES product used in the split benchmarks.
+goes_channels = {'goes_sxr': 'GOES-Long', 'goes_protons': '>=10 MeV'}
+
+
+def _result(swpc_files, name, mode):
+    return goes_modules[name]._to_dataframe(json.loads(swpc_files[name, mode]))
+
+
+@pytest.mark.benchmark(group='decode')
+@pytest.mark.parametrize('name, mode', goes_cases + [(name, None) for name in ['solar_probabilities'] + tables])
+def test_decode(benchmark, swpc_files, name, mode):
+    """
+    The decoding of the downloaded file (`_parse_json_file` without the download).
+    """
+    benchmark(json.loads, swpc_files[name, mode])
+
+
+@pytest.mark.benchmark(group='to_dataframe')
+@pytest.mark.parametrize('name, mode', goes_cases)
+def test_goes_to_dataframe(benchmark, swpc_files, name, mode):
+    data = json.loads(swpc_files[name, mode])
+    frame = benchmark(goes_modules[name]._to_dataframe, data)[0]
+    assert len(frame) == minutes[mode]
+
+
+@pytest.mark.benchmark(group='to_dataframe')
+def test_probabilities_to_dataframe(benchmark, swpc_files):
+    data = json.loads(swpc_files['solar_probabilities', None])
+    assert len(benchmark(goes_prop_json._to_dataframe, data)) == len(data)
+
+
+@pytest.mark.benchmark(group='to_dataframe')
+@pytest.mark.parametrize('name', tables)
+def test_table_to_frame(benchmark, swpc_files, name):
+    data = json.loads(swpc_files[name, None])
+    assert len(benchmark(registry.get(name).to_frame, data)) == len(data) - 1
+
+
+@pytest.mark.benchmark(group='split')
+@pytest.mark.parametrize('name, mode', goes_cases)
+def test_split_to_data(benchmark, swpc_files, name, mode):
+    result = _result(swpc_files, name, mode)
+    assert len(benchmark(goes_modules[name]._split_to_data, result, goes_channels[name])) == minutes[mode]
+
+
+@pytest.mark.benchmark(group='decimate')
+@pytest.mark.parametrize('name, mode', goes_cases)
+def test_decimate(benchmark, swpc_files, name, mode):
+    result = _result(swpc_files, name, mode)
+    benchmark(goes_modules[name]._decimate, result)
+
+
+@pytest.fixture(scope='module')
+def plots(swpc_files):
+    """
+    The functions that draw the figures of every product and mode with pyplot,
+    from the results that the application plots (the decimated GOES series).
+    """
+    plots = {}
+    for name, mode in goes_cases:
+        result = goes_modules[name]._decimate(_result(swpc_files, name, mode))
+        plots[name, mode] = lambda module=goes_modules[name], result=result, mode=mode: \
+            module.plot_(result, mode=mode, show=False)
+    result = goes_prop_json._to_dataframe(json.loads(swpc_files['solar_probabilities', None]))
+    plots['solar_probabilities', 'all'] = lambda: goes_prop_json.plot_latest_prop_all(result, show=False)
+    plots['solar_probabilities', 'c_class'] = lambda: goes_prop_json.plot_prop_timeline(result, show=False)
+    return plots
+
+
+plot_cases = goes_cases + [('solar_probabilities', 'all'), ('solar_probabilities', 'c_class')]
+
+
+@pytest.mark.benchmark(group='plot')
+@pytest.mark.parametrize('name, mode', plot_cases)
+def test_plot(benchmark, plots, name, mode):
+    """
+    The drawing of a figure by ``plot_``, without its rendering.
+    """
+    plot = plots[name, mode]
+
+    def draw():
+        plot()
+        plt.close('all')
+    benchmark(draw)
+
+
+@pytest.mark.benchmark(group='savefig')
+@pytest.mark.parametrize('name, mode', plot_cases)
+def test_savefig(benchmark, plots, name, mode):
+    """
+    The rendering of a drawn figure to PNG bytes (`packages.figures.render_png`).
+    """
+    plot = plots[name, mode]
+
+    def setup():
+        plot()
+        return (plt.gcf(),), {}
+    png = benchmark.pedantic(figures.render_png, setup=setup, rounds=10, warmup_rounds=1)
+    assert png.startswith(b'\x89PNG')
+
+
+@pytest.mark.benchmark(group='template')
+@pytest.mark.parametrize('name, mode', goes_cases)
+def test_template_render(benchmark, swpc_files, name, mode):
+    """
+    The update and rendering of a figure template, as done on a refresh of the application.
+    """
+    module = goes_modules[name]
+    result = module._decimate(_result(swpc_files, name, mode))
+    template = module.figure_template()
+    template.render_png(result)
+    benchmark(template.render_png, result)
@@ -1,5 +1,9 @@
 import os
 import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
 
 # https://stackoverflow.com/questions/20971619/ensuring-py-test-includes-the-application-directory-in-sys-path
 # Make sure that the application source directory (this directory's parent) is on sys.path.
@@ -7,3 +11,70 @@ import sys
 
 dir_swma = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'swma'))
 sys.path.insert(0, dir_swma)
+
+
+class StubServer:
+    """
+    A local HTTP server that serves fixed responses and records the requests.
+    Set ``routes[path] = (status, body)``; the responses carry an ETag so that
+    the conditional GET requests are answered with 304.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append((self.path, dict(self.headers)))
+                status, body = stub.routes.get(self.path, (404, b''))
+                etag = f'"{hash(body)}"'
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                stub.requests.append((self.path, self.rfile.read(length)))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def count(self, path):
+        return sum(1 for request in self.requests if request[0] == path)
+
+
+@pytest.fixture
+def stub_server():
+    stub = StubServer()
+    thread = threading.Thread(target=stub.server.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def archive_root(tmp_path_factory, monkeypatch):
+    """
+    The local archive of the GOES measurements is written in a temporary directory.
+    """
+    from packages.noaa_goes import goes_store
+
+    path = tmp_path_factory.mktemp('archive')
+    monkeypatch.setenv('SWMA_ARCHIVE', str(path))
+    yield path
+    # The background writes are done before the environment is restored
+    goes_store.flush()
@@ -0,0 +1,72 @@
+"""
+Tests for the threshold alerts
+"""
+import json
+
+import numpy as np
+import pandas as pd
+from packages import alerts, registry
+
+
+def _frame(values, start='2022-05-01'):
+    return pd.DataFrame({'flux': values}, index=pd.date_range(start, periods=len(values), freq='min'))
+
+
+def test_rule_hysteresis():
+    """
+    A flux that hovers around the trigger level raises one alert, cleared below the clear level.
+    """
+    rule = alerts.Rule('m1', 'sxr', 'flux', 1e-5, 5e-6)
+    frame = _frame([1e-6, 1.2e-5, 9e-6, 1.1e-5, np.nan, 7e-6, 4e-6, 2e-5])
+    transitions = rule.evaluate(frame)
+    assert [(alert.state, alert.time) for alert in transitions] == [
+        ('raised', frame.index[1]), ('cleared', frame.index[6]), ('raised', frame.index[7])]
+    assert rule.active
+    bz = alerts.Rule('bz', 'mag', 'flux', -10, -5, below=True)
+    assert [alert.state for alert in bz.evaluate(_frame([-2, -12, -8, -3]))] == ['raised', 'cleared']
+
+
+def test_engine_incremental(tmp_path):
+    """
+    Each sample is evaluated once, the feeds are asked only for the new samples.
+    """
+    frame = _frame([1e-6] * 10 + [2e-5] * 5 + [1e-6] * 5)
+    requested = []
+
+    def feed(after):
+        requested.append(after)
+        return frame if after is None else frame[frame.index > after]
+
+    sink = alerts.FileSink(tmp_path / 'alerts.jsonl')
+    engine = alerts.AlertEngine([alerts.Rule('m1', 'sxr', 'flux', 1e-5, 5e-6)], [sink], {'sxr': feed})
+    # The first check sets the state, the past transitions are not sent
+    assert engine.check() == []
+    assert engine.check() == []
+    assert requested == [None, frame.index[-1]]
+    # A new flare
+    frame = pd.concat([frame, _frame([3e-5, 4e-5], start=frame.index[-1] + pd.Timedelta('1min'))])
+    sent = engine.check()
+    assert [(alert.state, alert.time) for alert in sent] == [('raised', frame.index[-2])]
+    # Samples already evaluated do not raise the alert again
+    assert engine.evaluate('sxr', frame) == []
+    with open(tmp_path / 'alerts.jsonl') as file:
+        lines = [json.loads(line) for line in file]
+    assert [(line['rule'], line['state'], line['value']) for line in lines] == [('m1', 'raised', 3e-5)]
+
+
+def test_webhook_sink(stub_server):
+    def failing(alert):
+        raise OSError('unreachable')
+
+    # A failing sink does not stop the others
+    sink = alerts.WebhookSink(stub_server.url + '/alerts')
+    engine = alerts.AlertEngine([alerts.Rule('kp', 'kp', 'Kp', 5, 4)], [failing, sink])
+    table = [['time_tag', 'Kp', 'a_running', 'station_count'],
+             ['2022-05-01 00:00:00.000', '3.00', '15', '8'],
+             ['2022-05-01 03:00:00.000', '5.33', '56', '8']]
+    kp = registry.get('kp')
+    engine.evaluate('kp', kp.to_frame(table[:2]))
+    engine.evaluate('kp', kp.to_frame(table, after=pd.Timestamp('2022-05-01')))
+    posted = [json.loads(body) for path, body in stub_server.requests if path == '/alerts']
+    assert posted == [{'rule': 'kp', 'state': 'raised', 'time': '2022-05-01T03:00:00Z', 'value': 5.33,
+                       'message': 'kp'}]
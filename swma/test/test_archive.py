@@ -0,0 +1,160 @@
+"""
+Tests for the local archive of the GOES measurements
+"""
+import os
+import threading
+
+import pandas as pd
+from packages.noaa_goes import (goes_archive, goes_protons_json, goes_store,
+                                goes_sxr_json)
+from packages.noaa_goes.goes_archive import Archive, pick_resolution, query
+from packages.noaa_goes.goes_store import TimeSeriesStore
+
+from .test_noaa_goes import _proton_records, _sxr_records
+
+
+def test_append_and_read(archive_root):
+    frame = goes_sxr_json._to_dataframe(_sxr_records())[0]
+    archive = Archive('goes_sxr')
+    archive.append(frame)
+    # The records start at 23:00 and cover two days
+    assert sorted(name for name in os.listdir(archive_root / 'goes_sxr') if name.endswith('.parquet')) == \
+        ['2022-05-01.parquet', '2022-05-02.parquet']
+    assert archive.days() == [pd.Timestamp('2022-05-01'), pd.Timestamp('2022-05-02')]
+
+    result = archive.read(frame.index[0], frame.index[-1], channels=list(goes_sxr_json.channels.values()))
+    pd.testing.assert_frame_equal(result, frame, check_freq=False, check_names=False)
+    part = archive.read('2022-05-01T23:30', '2022-05-02T00:30')
+    assert part.index[0] == pd.Timestamp('2022-05-01T23:30') and part.index[-1] == pd.Timestamp('2022-05-02T00:30')
+
+
+def test_deduplicate(archive_root):
+    frame = goes_protons_json._to_dataframe(_proton_records())[0]
+    archive = Archive('goes_protons')
+    archive.append(frame.iloc[:100])
+    changed = frame.iloc[50:].copy()
+    changed['>=10 MeV'] += 1
+    archive.append(changed)
+    long = archive.read_long(frame.index[0], frame.index[-1])
+    assert len(long) == len(frame) * len(goes_protons_json.channels)
+    assert not long.duplicated(['time_tag', 'satellite', 'channel']).any()
+    # The latest value is kept
+    result = goes_protons_json.load_range(frame.index[0], frame.index[-1])[0]
+    assert (result['>=10 MeV'].iloc[50:] == changed['>=10 MeV']).all()
+    assert (result['>=10 MeV'].iloc[:50] == frame['>=10 MeV'].iloc[:50]).all()
+
+
+def test_store_appends_to_archive(archive_root):
+    result = goes_sxr_json._to_dataframe(_sxr_records())
+    frame = result[0]
+    tail = (frame.iloc[-60:], ) + result[1:]
+    loads = {'7-day': (frame.iloc[:-30],) + result[1:], '6-hour': tail}
+    archive = Archive('goes_sxr')
+    store = TimeSeriesStore(loads.get, archive=archive)
+    store.update()
+    goes_store.flush()
+    assert archive.read(frame.index[0], frame.index[-1]).index[-1] == frame.index[-31]
+    store.update()
+    goes_store.flush()
+    assert len(archive.read(frame.index[0], frame.index[-1])) == len(frame)
+
+
+def test_archive_batched(archive_root, monkeypatch):
+    """
+    The archive is written in the background, the measurements that arrive
+    during a write are appended in one batch.
+    """
+    result = goes_sxr_json._to_dataframe(_sxr_records())
+    frame = result[0]
+    archive = Archive('goes_sxr')
+    writing, appended = threading.Event(), []
+
+    def append(new):
+        writing.wait(5)
+        appended.append(new)
+    monkeypatch.setattr(archive, 'append', append)
+    store = TimeSeriesStore(None, archive=archive)
+    for i in range(0, 180, 60):
+        store._archive(frame.iloc[i:i + 60])
+    assert appended == []
+    writing.set()
+    goes_store.flush()
+    # The first write may have started before the other frames were queued
+    assert len(appended) <= 2
+    pd.testing.assert_frame_equal(pd.concat(appended), frame)
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setenv('SWMA_ARCHIVE', '')
+    archive = Archive('goes_sxr')
+    assert archive.append(goes_sxr_json._to_dataframe(_sxr_records())[0]) == 0
+    assert len(archive.read('2022-05-01', '2022-05-02')) == 0
+    archive.reindex()
+    time, flux = archive.query('0.1-0.8nm', '2022-05-01', '2022-05-02')
+    assert len(time) == 0 and len(flux) == 0
+    # A custom range is read from the live measurements only
+    result = goes_sxr_json._to_dataframe(_sxr_records())
+    monkeypatch.setattr(goes_sxr_json.store, 'get', lambda mode: result)
+    frame = goes_sxr_json.query_range(result[0].index[0], result[0].index[-1])[0]
+    assert len(frame) == len(result[0])
+
+
+def test_query(archive_root):
+    frame = goes_sxr_json._to_dataframe(_sxr_records())[0]
+    archive = Archive('goes_sxr')
+    archive.append(frame)
+    tstart, tend = pd.Timestamp('2022-05-01T23:10'), pd.Timestamp('2022-05-01T23:50')
+    time, flux = query('goes_sxr', '0.1-0.8nm', tstart, tend)
+    expected = frame.loc[tstart:tend, '0.1-0.8nm']
+    assert (time == expected.index.to_numpy()).all()
+    assert (flux == expected.to_numpy()).all()
+    # A zero-copy view of the memory-mapped file
+    assert not flux.flags.writeable and not flux.flags.owndata
+
+    # The range covers two daily files
+    time, flux = query('goes_sxr', '0.1-0.8nm', frame.index[0], frame.index[-1])
+    assert len(time) == len(frame)
+
+    time, flux_max = query('goes_sxr', '0.1-0.8nm', frame.index[0], frame.index[-1], '1-hour', 'max')
+    hourly = frame['0.1-0.8nm'].resample('1h').max()
+    assert (time == hourly.index.to_numpy()).all()
+    assert (flux_max == hourly.to_numpy()).all()
+    # The rollups of a day are replaced when the day is appended again,
+    # the memory maps of the replaced files are closed
+    path = archive.index_file('1-hour', frame.index[-1])
+    sources = [source for key, (source, _) in goes_archive._maps.items() if key[0] == path]
+    archive.append(frame.iloc[-1:] * [1, 2, 1])
+    assert sources and all(source.closed for source in sources)
+    assert not any(key[0] == path for key in goes_archive._maps)
+    assert flux_max[-1] == hourly.iloc[-1]
+    assert query('goes_sxr', '0.1-0.8nm', frame.index[0], frame.index[-1], '1-hour', 'max')[1][-1] == \
+        2 * frame['0.1-0.8nm'].iloc[-1]
+    assert len(query('goes_sxr', '0.1-0.8nm', frame.index[0], frame.index[-1], '5-min')[0]) == len(frame) // 5
+
+
+def test_pick_resolution():
+    assert pick_resolution('2022-05-01', '2022-05-02', 2000) == '1-min'
+    assert pick_resolution('2022-05-01', '2022-05-31', 2000) == '1-hour'
+    assert pick_resolution('2022-05-01', '2022-05-05', 2000) == '5-min'
+    # The default budget of the ranges gives the 1-minute measurements of the live modes
+    points = goes_sxr_json.series.points()
+    assert pick_resolution('2022-05-01', '2022-05-04', points) == '1-min'
+    assert pick_resolution('2022-05-01', '2022-05-08', points) == '1-min'
+    assert pick_resolution('2022-05-01', '2022-05-31', points) == '5-min'
+
+
+def test_query_range(archive_root, monkeypatch):
+    """
+    A custom range is read from the archive and merged with the live data.
+    """
+    result = goes_sxr_json._to_dataframe(_sxr_records())
+    frame = result[0]
+    goes_sxr_json.archive.append(frame.iloc[:120])
+    monkeypatch.setattr(goes_sxr_json.store, 'get', lambda mode: result)
+    merged = goes_sxr_json.query_range(frame.index[0], frame.index[-1])[0]
+    pd.testing.assert_frame_equal(merged, frame[merged.columns], check_freq=False, check_names=False)
+
+    # A long range is read from the hourly rollups, with the peaks
+    hourly = goes_sxr_json.query_range('2022-04-01', '2022-05-03', points=1000)[0]
+    assert (hourly.index == frame.index[[0, 60, 120]]).all()
+    assert hourly['0.1-0.8nm'].max() == frame['0.1-0.8nm'].max()
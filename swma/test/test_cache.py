@@ -0,0 +1,121 @@
+"""
+Tests for the process-wide response cache
+"""
+import io
+import json
+import threading
+import time
+
+from packages import fetch, images
+from packages.cache import CacheEntry, ResponseCache
+from PIL import Image
+
+
+def test_lock_per_key():
+    """
+    The downloads of one key wait for each other but not for the other keys,
+    and the lock of a key is dropped when it is no longer used.
+    """
+    response_cache = ResponseCache()
+    entered = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def download(key, name):
+        with response_cache.lock(key):
+            order.append(name)
+            entered.set()
+            release.wait(5)
+
+    first = threading.Thread(target=download, args=('a', 'first'))
+    first.start()
+    entered.wait(5)
+    # Another key is not blocked by the download in progress
+    with response_cache.lock('b'):
+        order.append('other')
+    second = threading.Thread(target=download, args=('a', 'second'))
+    second.start()
+    time.sleep(0.1)
+    assert order == ['first', 'other']
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert order == ['first', 'other', 'second']
+    for version in range(1000):
+        with response_cache.lock(('goes_sxr', '1-day', version)):
+            pass
+    assert response_cache._locks == {}
+
+
+def test_lru_eviction():
+    """
+    The least recently used entries are evicted past the maximum size.
+    """
+    response_cache = ResponseCache(max_bytes=10)
+    response_cache.put('a', CacheEntry(b'a', size=4))
+    response_cache.put('b', CacheEntry(b'b', size=4))
+    assert response_cache.get('a').value == b'a'
+    response_cache.put('c', CacheEntry(b'c', size=4))
+    assert 'b' not in response_cache and 'a' in response_cache and 'c' in response_cache
+    assert response_cache.nbytes == 8
+    # Replacing an entry updates the size, an entry larger than the cache is kept alone
+    response_cache.put('a', CacheEntry(b'a', size=2))
+    assert response_cache.nbytes == 6
+    response_cache.put('d', CacheEntry(b'd', size=20))
+    assert len(response_cache) == 1 and response_cache.nbytes == 20
+
+
+def _png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_image_cache(stub_server, monkeypatch):
+    """
+    A cached image is reused when the server replies 304, and the least
+    recently used images are evicted past the size of the image cache.
+    """
+    red, blue = _png('red'), _png('blue')
+    stub_server.routes['/red.png'] = (200, red)
+    stub_server.routes['/blue.png'] = (200, blue)
+    monkeypatch.setattr(images, 'image_cache', ResponseCache(max_bytes=len(red) + len(blue) - 1))
+    url = stub_server.url + '/red.png'
+    image = images.load_image(url, ttl=0)
+    assert image == red
+    # Stale: revalidated with a conditional GET, the server replies 304
+    assert images.load_image(url, ttl=0) is image
+    assert 'If-None-Match' in stub_server.requests[-1][1]
+    assert images.image_cache.nbytes == len(red)
+
+    # The blue image does not fit next to the red one, which is evicted
+    assert images.load_images([stub_server.url + '/blue.png'])[0] == blue
+    assert (url, images._verify) not in images.image_cache
+    assert images.load_image(url, ttl=0) == red
+    assert 'If-None-Match' not in stub_server.requests[-1][1]
+    assert stub_server.count('/red.png') == 3
+
+
+def test_fetch_cached_not_modified(stub_server):
+    """
+    A fresh entry is used without a request, a stale entry is revalidated and
+    its parsed value is reused on 304, a changed file is downloaded again.
+    """
+    response_cache = ResponseCache()
+    stub_server.routes['/kp.json'] = (200, b'[["time_tag", "Kp"]]')
+    url = stub_server.url + '/kp.json'
+    data = fetch.fetch_cached(url, 60, parse=json.loads, cache=response_cache)
+    assert fetch.fetch_cached(url, 60, parse=json.loads, cache=response_cache) is data
+    assert stub_server.count('/kp.json') == 1
+    with fetch.revalidate():
+        assert fetch.fetch_cached(url, 60, parse=json.loads, cache=response_cache) is data
+    assert stub_server.count('/kp.json') == 2
+    assert stub_server.requests[-1][1]['If-None-Match'] == response_cache.get((url, json.loads)).etag
+    # The 304 makes the entry fresh again
+    assert fetch.fetch_cached(url, 60, parse=json.loads, cache=response_cache) is data
+    assert stub_server.count('/kp.json') == 2
+
+    stub_server.routes['/kp.json'] = (200, b'[["time_tag", "Kp"], ["2022-05-01 00:00:00.000", "5.33"]]')
+    with fetch.revalidate():
+        assert len(fetch.fetch_cached(url, 60, parse=json.loads, cache=response_cache)) == 2
+    assert stub_server.count('/kp.json') == 3
@@ -0,0 +1,77 @@
+"""
+Tests for the figure templates
+"""
+import io
+
+import matplotlib
+import matplotlib.pyplot as plt
+import pandas as pd
+import pytest
+from packages import figures
+from packages.noaa_goes import goes_protons_json, goes_sxr_json
+
+from .test_noaa_goes import _proton_records, _sxr_records
+
+matplotlib.use('Agg')
+
+
+@pytest.mark.parametrize('module, records', [
+    (goes_sxr_json, _sxr_records),
+    (goes_protons_json, _proton_records),
+])
+def test_template_matches_plot(module, records):
+    """
+    An updated template draws the same figure as plot_.
+    """
+    result = module._to_dataframe(records())
+    template = module.figure_template()
+    template.render_png((result[0].iloc[:60],) + result[1:])
+    lines = list(template.artists['lines'].values())
+    png = template.render_png(result)
+    # The artists are updated, not created again
+    assert list(template.artists['lines'].values()) == lines
+    assert len(lines[0].get_xdata()) == len(result[0])
+
+    module.plot_(result, show=False)
+    buffer = io.BytesIO()
+    plt.gcf().savefig(buffer, format='png', bbox_inches='tight', dpi=figures.dpi)
+    plt.close('all')
+    assert png == buffer.getvalue()
+
+
+def test_flares_overlay():
+    """
+    The flares within the plot are drawn as one collection of lines.
+    """
+    from matplotlib.collections import LineCollection
+
+    result = goes_sxr_json._to_dataframe(_sxr_records())
+    flares = pd.DataFrame({'max_xrlong': [1e-5, 2e-5, 3e-6, 4e-6], 'max_class': ['M1.0', 'M2.0', 'C3.0', 'C4.0']},
+                          index=pd.DatetimeIndex(['2022-04-30T12:00', '2022-05-02T00:30', '2022-05-02T01:00',
+                                                  '2022-05-02T03:00'], name='max_time'))
+    template = goes_sxr_json.figure_template()
+    template.update(result, plot_flares=True, flares=flares)
+    collections = [artist for artist in template.artists['flares'] if isinstance(artist, LineCollection)]
+    assert len(collections) == 1
+    assert len(collections[0].get_segments()) == 2
+    assert [text.get_text() for text in template.artists['axes'].texts] == ['M2.0', 'C3.0']
+    # The overlay is replaced on update
+    template.update(result, plot_flares=False)
+    assert template.artists['flares'] == [] and len(template.artists['axes'].texts) == 0
+
+
+def test_custom_range_without_live_feed(monkeypatch):
+    """
+    A custom range is drawn from the archive when the live feed is down, without the flares.
+    """
+    import caching
+
+    result = goes_sxr_json._to_dataframe(_sxr_records())
+    monkeypatch.setattr(goes_sxr_json, 'query_range', lambda tstart, tend: result)
+
+    def detect_flares():
+        raise OSError('The live feed is down')
+    monkeypatch.setattr(goes_sxr_json, 'detect_flares', detect_flares)
+    time_range = (result[0].index[0], result[0].index[-1])
+    png = caching.goes_sxr_png.__wrapped__('Custom range', True, time_range)
+    assert png.startswith(b'\x89PNG')
@@ -1,4 +1,11 @@
+import json
 import pkgutil
+import subprocess
+import sys
+
+import pytest
+
+from .conftest import dir_swma
 
 
 def test_import_main():
@@ -26,3 +33,36 @@ def test_imports_all():
     for imper, nm, ispkg in pkgutil.walk_packages(['PyThea'], 'PyThea.',
                                                   onerror=on_error):
         imper.find_spec(nm)
+
+
+# The packages that are imported only when a figure is drawn or a time series is built.
+deferred = ['sunpy', 'astropy', 'matplotlib']
+
+
+def _import_time(statement):
+    """
+    Runs an import statement in a new interpreter and returns its duration in
+    seconds and the deferred packages it imported.
+    """
+    code = ('import json, sys, time\n'
+            't = time.perf_counter()\n'
+            f'{statement}\n'
+            't = time.perf_counter() - t\n'
+            f'print(json.dumps([t, [name for name in {deferred!r} if name in sys.modules]]))')
+    output = subprocess.run([sys.executable, '-c', code], cwd=dir_swma, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@pytest.mark.parametrize('statement', ['import swma',
+                                       'import cli',
+                                       'from packages.noaa_goes import goes_sxr_json, goes_protons_json, goes_prop_json',
+                                       'from packages import renderer, poller, alerts'])
+def test_import_time(statement, record_property):
+    """
+    The application, the command line interface and the data modules start
+    without the plotting and the time series packages.
+    """
+    seconds, imported = _import_time(statement)
+    record_property('import_seconds', seconds)
+    assert imported == []
@@ -0,0 +1,208 @@
+"""
+Tests for the NOAA GOES JSON modules
+"""
+from collections import OrderedDict
+
+import astropy.units as u
+import numpy as np
+import pandas as pd
+import pytest
+from packages import registry
+from packages.noaa_goes import (goes_flares, goes_prop_json, goes_protons_json,
+                                goes_sxr_json)
+from packages.noaa_goes.utils import decimate, parse_time_tag
+from pandas import json_normalize
+from sunpy.time import parse_time
+
+
+def _legacy_index(data, key):
+    """
+    The time index as it was built before `parse_time_tag`.
+    """
+    result = json_normalize(data)
+    result = result.set_index(key)
+    result.index = pd.DatetimeIndex(result.index.values)
+    result.index = pd.DatetimeIndex(parse_time(
+        [x for x in result.index.values]).isot.astype('datetime64'))
+    return result.index
+
+
+def _sxr_records(n=180):
+    time_tags = pd.date_range('2022-05-01T23:00', periods=n, freq='min').strftime('%Y-%m-%dT%H:%M:%SZ')
+    return [{'time_tag': t, 'satellite': 16, 'flux': 1e-6 + i * 1e-9, 'energy': energy}
+            for i, t in enumerate(time_tags) for energy in ('0.05-0.4nm', '0.1-0.8nm')]
+
+
+def _proton_records(n=180):
+    time_tags = pd.date_range('2022-05-01T23:00', periods=n, freq='min').strftime('%Y-%m-%dT%H:%M:%SZ')
+    return [{'time_tag': t, 'satellite': 16, 'flux': 0.1 + i, 'energy': energy}
+            for i, t in enumerate(time_tags)
+            for energy in ('>=1 MeV', '>=10 MeV', '>=50 MeV', '>=100 MeV', '>=500 MeV')]
+
+
+def _prop_records(n=5):
+    dates = pd.date_range('2022-05-01', periods=n, freq='D').strftime('%Y-%m-%d')
+    return [dict({'date': d, 'polar_cap_absorption': 'green'},
+                 **{f'{event}_{day}_day': 50 for event in ('c_class', 'm_class', 'x_class', '10mev_protons')
+                    for day in (1, 2, 3)})
+            for d in dates]
+
+
+@pytest.mark.parametrize('module, records, key', [
+    (goes_sxr_json, _sxr_records, 'time_tag'),
+    (goes_protons_json, _proton_records, 'time_tag'),
+    (goes_prop_json, _prop_records, 'date'),
+])
+def test_time_index_unchanged(module, records, key):
+    """
+    The vectorized time tag parser gives the same index as the sunpy parse_time round-trip.
+    """
+    data = records()
+    result = module._to_dataframe(data)
+    index = result[0].index if isinstance(result, tuple) else result.index
+    assert index.dtype == 'datetime64[ns]'
+    # The GOES frames have one row per time tag (and one column per channel)
+    pd.testing.assert_index_equal(index, _legacy_index(data, key).unique().as_unit('ns'))
+
+
+def test_parse_time_tag():
+    index = parse_time_tag(['2022-05-01T00:00:00Z', '2022-05-01T00:01:00Z'])
+    assert index.tz is None
+    assert list(index) == [pd.Timestamp('2022-05-01 00:00'), pd.Timestamp('2022-05-01 00:01')]
+
+
+def test_channels_pivot():
+    """
+    Each channel is a column of the frame with the flux of the records.
+    """
+    data = _proton_records()
+    frame = goes_protons_json._to_dataframe(data)[0]
+    assert list(frame.columns) == ['satellite'] + goes_protons_json.channels
+    flux = json_normalize(data).set_index('energy').loc['>=10 MeV', 'flux'].to_numpy()
+    assert (goes_protons_json._split_to_data((frame,), '>=10 MeV').to_numpy() == flux).all()
+    assert frame['>=10 MeV'].to_numpy().flags['C_CONTIGUOUS']
+
+
+def test_decimate_keeps_peaks():
+    """
+    The decimated 7-day series keeps the flux and the time of the peaks.
+    """
+    rng = np.random.default_rng(0)
+    n = 7 * 1440
+    time = pd.date_range('2022-05-01', periods=n, freq='min')
+    long = 1e-6 * np.exp(rng.normal(0, 0.1, n))
+    long[3001] = 3e-4  # a short X3 flare
+    short = long / 10
+    short[5000:5010] = np.nan
+    frame = pd.DataFrame({'satellite': np.full(n, 16, dtype='int16'), '0.1-0.8nm': long, '0.05-0.4nm': short},
+                         index=time)
+    result = decimate(frame, 700)
+    assert len(result) < n / 2
+    assert result.index[0] == time[0] and result.index[-1] == time[-1]
+    for name in ('0.1-0.8nm', '0.05-0.4nm'):
+        assert result[name].max() == frame[name].max()
+        assert result[name].idxmax() == frame[name].idxmax()
+        assert result[name].min() == frame[name].min()
+    assert result.index[result['0.1-0.8nm'].argmax()] == time[3001]
+    # The data gap is kept
+    assert result['0.05-0.4nm'].isna().any()
+    assert decimate(frame, None) is frame
+    # The decimation is set on the series of a product
+    result = (frame, {}, {})
+    series = goes_sxr_json.series
+    assert len(goes_sxr_json._decimate(result)[0]) == len(result[0].pipe(decimate, series.decimation))
+    series.decimation = None
+    try:
+        assert goes_sxr_json._decimate(result)[0] is frame and series.points() is None
+    finally:
+        series.decimation = 700
+
+
+def _flare_series():
+    """
+    A quiet C1 background with an M5 and an X2.3 flare (6 minutes of rise, exponential decay).
+    """
+    time = pd.date_range('2022-05-01', periods=600, freq='min')
+    flux = np.full(len(time), 1e-6)
+    for start, peak in ((100, 5e-5), (400, 2.3e-4)):
+        flux[start:start + 7] = np.geomspace(1e-6, peak, 7)
+        flux[start + 7:start + 157] = 1e-6 + (peak - 1e-6) * np.exp(-np.arange(1, 151) / 15)
+    return pd.Series(flux, index=time)
+
+
+def test_detect_flares():
+    series = _flare_series()
+    flares = goes_flares.detect(series)
+    assert list(flares['max_class']) == ['M5.0', 'X2.3']
+    assert list(flares.index) == [series.index[106], series.index[406]]
+    assert list(flares['begin_time']) == [series.index[100], series.index[400]]
+    # The end is half way between the start and the peak flux
+    end = flares['end_time'].iloc[0]
+    assert series[end] <= (5e-5 + 1e-6) / 2 < series[end - pd.Timedelta('1min')]
+    assert list(goes_flares.goes_class([2.5e-5, 9.99e-7, 1.23e-3])) == ['M2.5', 'C1.0', 'X12.3']
+
+
+def test_flare_detector_incremental():
+    """
+    The flares found minute by minute are the ones found at once, and only
+    the minutes that can still be part of a flare are kept.
+    """
+    series = _flare_series()
+    detector = goes_flares.FlareDetector()
+    for end in range(1, 410):
+        flares = detector.update(series.iloc[:end])
+    # The X flare is in progress
+    assert list(flares['max_class']) == ['M5.0', 'X2.3'] and pd.isna(flares['end_time'].iloc[-1])
+    for end in range(410, len(series) + 1):
+        flares = detector.update(series.iloc[:end])
+        assert len(detector._time) < 200
+    pd.testing.assert_frame_equal(flares, goes_flares.detect(series))
+    assert len(detector._time) == goes_flares.rise_minutes - 1
+
+
+def test_flares_on_risen_background():
+    """
+    A flare after which the background settles above its half-way level ends
+    at the start of the next flare, and the detector keeps a bounded buffer.
+    """
+    time = pd.date_range('2022-05-01', periods=900, freq='min')
+    flux = np.full(len(time), 8e-7)
+    flux[100:107] = np.geomspace(8e-7, 2e-6, 7)
+    flux[107:] = 1.5e-6 + (2e-6 - 1.5e-6) * np.exp(-np.arange(1, len(time) - 106) / 15)
+    flux[300:307] = np.geomspace(1.5e-6, 5e-5, 7)
+    flux[307:] = 1.5e-6 + (5e-5 - 1.5e-6) * np.exp(-np.arange(1, len(time) - 306) / 15)
+    series = pd.Series(flux, index=time)
+    flares = goes_flares.detect(series)
+    assert list(flares['max_class']) == ['C2.0', 'M5.0']
+    assert list(flares['begin_time']) == [time[100], time[300]]
+    assert flares['end_time'].iloc[0] == time[300]
+
+    detector = goes_flares.FlareDetector()
+    for end in range(60, len(series) + 60, 60):
+        detector.update(series.iloc[:end])
+        assert len(detector._time) <= goes_flares.max_minutes + 1
+    pd.testing.assert_frame_equal(detector.flares(), flares)
+
+    # Without a next flare, a flare is closed after max_minutes
+    series.iloc[300:] = 1.5e-6
+    flares = goes_flares.detect(series)
+    assert flares['end_time'].iloc[0] == time[100 + goes_flares.max_minutes]
+
+
+def test_registry_products():
+    """
+    The GOES modules read their files with the declarations of the registry.
+    """
+    product = registry.get('goes_sxr')
+    assert goes_sxr_json.product is product
+    # The store and the archive of each GOES module are built from its product
+    for module in (goes_sxr_json, goes_protons_json):
+        assert module.series.product is module.product and module.store is module.series.store
+        assert module.archive.product == module.product.name
+    assert product.url_for('1-day') == 'https://services.swpc.noaa.gov/json/goes/primary/xrays-1-day.json'
+    with pytest.raises(ValueError):
+        product.url_for('2-day')
+    frame, meta, units = goes_sxr_json._to_dataframe(_sxr_records())
+    assert units == OrderedDict([('satellite', u.dimensionless_unscaled), ('0.1-0.8nm', u.W / u.m**2),
+                                 ('0.05-0.4nm', u.W / u.m**2)])
+    assert goes_protons_json._to_dataframe(_proton_records())[2]['>=10 MeV'] == 1 / (u.cm**2 * u.s * u.sr)
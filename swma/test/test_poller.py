@@ -0,0 +1,56 @@
+"""
+Tests for the background poller, against a local stub HTTP server
+"""
+import time
+
+from packages import fetch
+from packages.poller import Poller, Source, jitter
+
+
+def _wait_for(condition, timeout=5):
+    tend = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < tend, 'timeout'
+        time.sleep(0.01)
+
+
+def test_poller_publishes_and_revalidates(stub_server):
+    stub_server.routes['/product.json'] = (200, b'[1, 2, 3]')
+    url = stub_server.url + '/product.json'
+    poller = Poller([Source('product', lambda: fetch.fetch_json(url, ttl=60), 0.05)], seed=0)
+    poller.start()
+    try:
+        _wait_for(lambda: stub_server.count('/product.json') >= 3)
+    finally:
+        poller.stop()
+    assert poller.get('product') == [1, 2, 3]
+    # The polls revalidate the (still fresh) cached entry with a conditional GET
+    assert any('If-None-Match' in headers for path, headers in stub_server.requests)
+    fetch.response_cache.invalidate(url)
+
+
+def test_poller_isolates_failures(stub_server):
+    stub_server.routes['/good.json'] = (200, b'{"a": 1}')
+    good = stub_server.url + '/good.json'
+    bad = stub_server.url + '/bad.json'
+    poller = Poller([Source('good', lambda: fetch.fetch_json(good), 0.05),
+                     Source('bad', lambda: fetch.fetch_json(bad), 0.05)], seed=0)
+    poller.start()
+    try:
+        _wait_for(lambda: stub_server.count('/good.json') >= 3 and poller.status()['bad'][1] >= 1)
+    finally:
+        poller.stop()
+    assert poller.get('good') == {'a': 1}
+    assert poller.get('bad') is None
+    updated, failures, error = poller.status()['bad']
+    assert updated is None and failures >= 1 and error is not None
+
+
+def test_poller_jitter_and_backoff():
+    source = Source('product', lambda: None, 60)
+    poller = Poller([source], seed=1)
+    delays = [poller.delay(source) for _ in range(100)]
+    assert all(60 * (1 - jitter) <= delay <= 60 * (1 + jitter) for delay in delays)
+    assert len(set(delays)) > 1
+    source.failures = 3
+    assert poller.delay(source) >= 4 * 60 * (1 - jitter)
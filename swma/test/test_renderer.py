@@ -0,0 +1,85 @@
+"""
+Tests for the headless batch renderer
+"""
+import os
+import time
+
+import matplotlib
+import pandas as pd
+import pytest
+from packages import farm, figures, renderer
+from packages.noaa_goes import goes_prop_json, goes_protons_json, goes_sxr_json
+
+from .test_noaa_goes import _prop_records, _proton_records, _sxr_records
+
+matplotlib.use('Agg')
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """
+    The products come from synthetic data, the SXR store fails.
+    """
+    def fail(mode):
+        raise OSError('offline')
+
+    protons = goes_protons_json._to_dataframe(_proton_records())
+    monkeypatch.setattr(goes_sxr_json.store, 'get', fail)
+    monkeypatch.setattr(goes_protons_json.store, 'get', lambda mode: protons)
+    monkeypatch.setattr(goes_prop_json, '_load', lambda: goes_prop_json._to_dataframe(_prop_records()))
+    figures.invalidate()
+    yield
+    figures.invalidate()
+
+
+def test_render(offline, tmp_path):
+    batch = renderer.Renderer(str(tmp_path))
+    written = batch.render()
+    # The failing SXR product is skipped, the others are rendered
+    assert not any(name.startswith('GOES_SXR') for name in written)
+    assert len(written) == len(renderer.modes) + 1 + len(renderer.prop_modes)
+    assert all(written.values())
+    assert sorted(os.listdir(tmp_path)) == sorted(written)
+    with open(tmp_path / 'GOES_PROTONS_latest_1-day.png', 'rb') as file:
+        assert file.read(8) == b'\x89PNG\r\n\x1a\n'
+    # Unchanged data are not written again
+    assert not any(batch.render().values())
+
+
+def test_render_sxr(monkeypatch, tmp_path):
+    sxr = goes_sxr_json._to_dataframe(_sxr_records())
+    monkeypatch.setattr(goes_sxr_json.store, 'get', lambda mode: sxr)
+    monkeypatch.setattr(renderer, 'products', lambda flares: {'goes_sxr': lambda: renderer._sxr_jobs(flares)})
+    written = renderer.Renderer(str(tmp_path), flares=False).render()
+    assert list(written) == [f'GOES_SXR_latest_{mode}.png' for mode in renderer.modes]
+
+
+def test_pack_roundtrip():
+    result = goes_sxr_json._to_dataframe(_sxr_records())
+    unpacked = farm.unpack(farm.pack(result))
+    pd.testing.assert_frame_equal(unpacked[0], result[0])
+    assert unpacked[2] == result[2]
+
+
+def test_render_farm(offline, tmp_path):
+    batch = renderer.Renderer(str(tmp_path), workers=2)
+    try:
+        written = batch.render()
+    finally:
+        batch.close()
+    assert len(written) == len(renderer.modes) + 1 + len(renderer.prop_modes)
+    assert all(written.values())
+    with open(tmp_path / 'NOAA_latest_prop_all.png', 'rb') as file:
+        assert file.read(8) == b'\x89PNG\r\n\x1a\n'
+
+
+def test_render_farm_deadline(caplog):
+    """
+    A job that cannot meet its deadline is not rendered.
+    """
+    result = goes_protons_json._to_dataframe(_proton_records())
+    job = renderer.Job('late.png', ('goes_protons', 'late'), goes_protons_json.plot_, result, {},
+                       time.monotonic() - 1)
+    render_farm = farm.RenderFarm(1)
+    assert list(render_farm.render([job])) == []
+    assert 'late.png' in caplog.text
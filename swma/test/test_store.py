@@ -0,0 +1,88 @@
+"""
+Tests for the in-memory store of the GOES time series
+"""
+import numpy as np
+import pandas as pd
+from packages.noaa_goes import goes_store
+from packages.noaa_goes.goes_store import TimeSeriesStore
+
+start = pd.Timestamp('2022-05-01')
+
+
+def _result(tstart, periods, value=0.):
+    index = pd.date_range(tstart, periods=periods, freq='min')
+    frame = pd.DataFrame({'0.1-0.8nm': np.arange(periods, dtype='float64') + value}, index=index)
+    return frame, {}, {}
+
+
+class Files:
+    """
+    The results of the files by mode, records the loaded modes.
+    """
+
+    def __init__(self, files):
+        self.files = files
+        self.loads = []
+
+    def __call__(self, mode):
+        self.loads.append(mode)
+        return self.files[mode]
+
+
+def test_top_up_with_newer_rows():
+    """
+    Only the rows of the tail file newer than the store are appended.
+    """
+    seed = _result(start, 1440)
+    tail = _result(start + pd.Timedelta(minutes=1440 + 10 - 360), 360, value=-1e6)
+    files = Files({'7-day': seed, '6-hour': tail})
+    store = TimeSeriesStore(files)
+    assert store.update()[0] is seed[0]
+    frame = store.update()[0]
+    assert files.loads == ['7-day', '6-hour']
+    assert len(frame) == 1440 + 10 and frame.index[-1] == tail[0].index[-1]
+    # The rows of the store that are also in the tail file are kept as they are
+    pd.testing.assert_frame_equal(frame.iloc[:1440], seed[0])
+    pd.testing.assert_frame_equal(frame.iloc[1440:], tail[0].iloc[-10:])
+    assert store.get('6-hour')[0].index[0] == frame.index[-1] - pd.Timedelta(hours=6) + pd.Timedelta(minutes=1)
+
+
+def test_eviction_at_window():
+    """
+    The rows older than the 7-day window are evicted.
+    """
+    minutes = 7 * 1440
+    # The tail file overlaps with the last minute of the store
+    files = Files({'7-day': _result(start, minutes), '6-hour': _result(start + pd.Timedelta(minutes=minutes - 1), 61)})
+    store = TimeSeriesStore(files)
+    store.update()
+    frame = store.update()[0]
+    assert len(frame) == minutes
+    assert frame.index[0] == start + pd.Timedelta(minutes=60)
+    assert frame.index[-1] - frame.index[0] < pd.Timedelta(days=7)
+
+
+def test_reseed_on_gap():
+    """
+    A tail file that does not overlap with the store seeds the store again.
+    """
+    files = Files({'7-day': _result(start, 1440), '6-hour': _result(start + pd.Timedelta(days=2), 360)})
+    store = TimeSeriesStore(files)
+    store.update()
+    files.files['7-day'] = seed = _result(start + pd.Timedelta(days=1), 1800)
+    assert store.update() is seed
+    assert files.loads == ['7-day', '6-hour', '7-day']
+
+
+def test_same_tail_short_circuit(monkeypatch):
+    """
+    The same (cached) tail file is not merged again.
+    """
+    files = Files({'7-day': _result(start, 1440), '6-hour': _result(start + pd.Timedelta(minutes=1440 - 350), 360)})
+    store = TimeSeriesStore(files)
+    store.update()
+    result = store.update()
+    slices = []
+    monkeypatch.setattr(goes_store, '_slice', lambda *args: slices.append(args))
+    assert store.update() is result
+    assert slices == [] and files.loads == ['7-day', '6-hour', '6-hour']
@@ -19,13 +19,51 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import io
+import datetime
 from collections import OrderedDict
 
-import requests
+import caching
+import pandas as pd
 import streamlit as st
-from packages.noaa_goes import goes_prop_json, goes_protons_json, goes_sxr_json
-from PIL import Image
+from packages import images, registry
+
+
+def _show_image(column, image, caption=''):
+    """
+    Shows an image in a column of the page, or a placeholder if the image failed to load.
+    """
+    if image is None:
+        column.warning('Image currently unavailable.')
+    else:
+        column.image(image, caption=caption)
+
+
+# The modes of the GOES monitors: the files served by SWPC and a custom range from the local archive.
+goes_modes = ('1-day', '3-day', '7-day', '6-hour', 'Custom range')
+
+
+def _select_time_range():
+    """
+    Asks for the dates of a custom time range in the sidebar.
+    Returns the start and the end times, or None if the range is not complete.
+    """
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    dates = st.sidebar.date_input('Select a date range (UT):', value=(today - datetime.timedelta(days=30), today),
+                                  max_value=today)
+    if not isinstance(dates, (tuple, list)) or len(dates) < 2:
+        st.info('Select the start and the end date of the range.')
+        return None
+    return pd.Timestamp(dates[0]), pd.Timestamp(dates[1]) + pd.Timedelta(days=1) - pd.Timedelta(1)
+
+
+def _time_range(option):
+    """
+    Returns the time range of a GOES monitor: None for the live modes, False
+    if the custom range is not complete.
+    """
+    if option != 'Custom range':
+        return None
+    return _select_time_range() or False
 
 
 def intro():
@@ -70,19 +108,22 @@ def goes_sxr():
     """
     PLot the real-time soft x-rays.
     """
-    option = st.sidebar.selectbox('Select a mode for realtime data:',
-                                  ('1-day', '3-day', '7-day', '6-hour'))
+    option = st.sidebar.selectbox('Select a mode for realtime data:', goes_modes)
     plt_flare = st.sidebar.checkbox('Plot Latest Flares', value=True)
-    st.sidebar.button('Refresh')
-
-    plt = goes_sxr_json.produce_plot(mode=option,
-                                     plot_flares=plt_flare,
-                                     in_app=True)
+    clicked = st.sidebar.button('Refresh')
+
+    time_range = _time_range(option)
+    if time_range is False:
+        return
+    with caching.refresh(clicked, caching.goes_sxr_png):
+        png = caching.goes_sxr_png(option, plt_flare, time_range)
+    if png is None:
+        st.warning('There are no archived data in this time range.')
+        return
+    st.image(png)
     # Download button
-    plot = io.BytesIO()
-    plt.savefig(plot, format='png', bbox_inches='tight')
     st.download_button('Download figure as .png file',
-                       plot.getvalue(),
+                       png,
                        'NOAA_GOES_SXR_flux.png')
     st.markdown(
         """
@@ -105,16 +146,21 @@ def goes_proton():
     """
     Plot the real-time proton flux.
     """
-    option = st.sidebar.selectbox('Select a mode for realtime data:',
-                                  ('1-day', '3-day', '7-day', '6-hour'))
-    st.sidebar.button('Refresh')
-
-    plt = goes_protons_json.produce_plot(mode=option, in_app=True)
+    option = st.sidebar.selectbox('Select a mode for realtime data:', goes_modes)
+    clicked = st.sidebar.button('Refresh')
+
+    time_range = _time_range(option)
+    if time_range is False:
+        return
+    with caching.refresh(clicked, caching.goes_protons_png):
+        png = caching.goes_protons_png(option, time_range)
+    if png is None:
+        st.warning('There are no archived data in this time range.')
+        return
+    st.image(png)
     # Download button
-    plot2 = io.BytesIO()
-    plt.savefig(plot2, format='png', bbox_inches='tight')
     st.download_button('Download figure as .png file',
-                       plot2.getvalue(),
+                       png,
                        'NOAA_GOES_Proton_flux.png')
     st.markdown(
         """
@@ -137,28 +183,25 @@ def noaa_forecast():
     """
     PLot the real-time NOAA forecast.
     """
-    st.sidebar.button('Refresh')
+    clicked = st.sidebar.button('Refresh')
 
-    data = goes_prop_json._parse_json_file()
-    result = goes_prop_json._to_dataframe(data)
     # First Plot
-    plt = goes_prop_json.plot_latest_prop_all(result, in_app=True)
+    with caching.refresh(clicked, caching.solar_probabilities_png):
+        png = caching.solar_probabilities_png()
+    st.image(png)
     # Download button
-    plot1 = io.BytesIO()
-    plt.savefig(plot1, format='png', bbox_inches='tight')
     st.download_button('Download figure as .png file',
-                       plot1.getvalue(),
+                       png,
                        'NOAA_GOES_Probability.png')
 
     option = st.selectbox('Select a mode for timeline data:',
                           ('c_class', 'm_class', 'x_class', '10mev_protons'))
 
     # Second Plot
-    goes_prop_json.plot_prop_timeline(result, mode=option, in_app=True)
-    plot2 = io.BytesIO()
-    plt.savefig(plot2, format='png', bbox_inches='tight')
+    png = caching.solar_probabilities_png(option)
+    st.image(png)
     st.download_button('Download figure as .png file',
-                       plot2.getvalue(),
+                       png,
                        'NOAA_GOES_Probability_Timeline.png')
 
 
@@ -169,6 +212,9 @@ def aia_realtime():
     option = st.sidebar.selectbox('Select wavelength:',
                                   ['Overview'])
 
+    sdo = registry.get('sdo_latest')
+    # The panels of the page, row by row.
+    layout = []
     if option == 'Overview':
         pfss_mode = st.sidebar.checkbox('View PFSS', value=False)
         if pfss_mode is True:
@@ -176,64 +222,31 @@ def aia_realtime():
         else:
             pfss = ''
         resolution = 512
-        left_column, right_column = st.columns(2)
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        'assets/img/latest/f_211_193_171pfss_1024.jpg',
-                                        stream=True).raw)
-        left_column.image(image, caption='')
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        f'assets/img/latest/latest_{resolution}_HMIB{pfss}.jpg',
-                                        stream=True).raw)
-        right_column.image(image, caption='')
-
-        one_, two_, three_, four_ = st.columns(4)
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        f'assets/img/latest/latest_{resolution}_0171{pfss}.jpg',
-                                        stream=True).raw)
-        one_.image(image, caption='')
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        f'assets/img/latest/latest_{resolution}_0193{pfss}.jpg',
-                                        stream=True).raw)
-        two_.image(image, caption='')
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        f'assets/img/latest/latest_{resolution}_0211{pfss}.jpg',
-                                        stream=True).raw)
-        three_.image(image, caption='')
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        f'assets/img/latest/latest_{resolution}_0304{pfss}.jpg',
-                                        stream=True).raw)
-        four_.image(image, caption='')
-
-        one_, two_, three_, four_ = st.columns(4)
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        f'assets/img/latest/latest_{resolution}_0094{pfss}.jpg',
-                                        stream=True).raw)
-        one_.image(image, caption='')
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        f'assets/img/latest/latest_{resolution}_0131{pfss}.jpg',
-                                        stream=True).raw)
-        two_.image(image, caption='')
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        f'assets/img/latest/latest_{resolution}_0335{pfss}.jpg',
-                                        stream=True).raw)
-        three_.image(image, caption='')
-        image = Image.open(requests.get('https://sdo.gsfc.nasa.gov/'
-                                        f'assets/img/latest/latest_{resolution}_1700{pfss}.jpg',
-                                        stream=True).raw)
-        four_.image(image, caption='')
-        one_, two_, = st.columns(2)
-        image = Image.open(
-            requests.get('https://sdo.gsfc.nasa.gov/assets/img/latest/latest_512_HMIIC.jpg',
-                         stream=True).raw
-        )
-        one_.image(image, caption='')
-        image = Image.open(
-            requests.get('http://jsoc.stanford.edu/data/hmi/HARPs_images/latest_nrt.png',
-                         stream=True).raw
-        )
-        two_.image(image, caption='')
-
-    st.sidebar.button('Refresh')
+        layout = [
+            [sdo.url_for('f_211_193_171pfss_1024.jpg'),
+             sdo.url_for(f'latest_{resolution}_HMIB{pfss}.jpg')],
+            [sdo.url_for(f'latest_{resolution}_0171{pfss}.jpg'),
+             sdo.url_for(f'latest_{resolution}_0193{pfss}.jpg'),
+             sdo.url_for(f'latest_{resolution}_0211{pfss}.jpg'),
+             sdo.url_for(f'latest_{resolution}_0304{pfss}.jpg')],
+            [sdo.url_for(f'latest_{resolution}_0094{pfss}.jpg'),
+             sdo.url_for(f'latest_{resolution}_0131{pfss}.jpg'),
+             sdo.url_for(f'latest_{resolution}_0335{pfss}.jpg'),
+             sdo.url_for(f'latest_{resolution}_1700{pfss}.jpg')],
+            [sdo.url_for('latest_512_HMIIC.jpg'),
+             registry.get('hmi_harps').url_for()],
+        ]
+    urls = [image_url for row in layout for image_url in row]
+
+    # The images of the page are downloaded again after a refresh.
+    if st.sidebar.button('Refresh'):
+        for image_url in urls:
+            images.image_cache.invalidate(image_url)
+
+    image_list = images.load_images(urls, ttl=sdo.ttl)
+    for row in layout:
+        for column in st.columns(len(row)):
+            _show_image(column, image_list.pop(0))
 
     st.markdown('_Images Courtesy of NASA/SDO and the AIA, EVE, and HMI science teams._')
     st.markdown(
@@ -257,14 +270,10 @@ def lasco_realtime():
     View real-time coronagraphic images from SoHO/LASCO.
     """
     left_column, right_column = st.columns(2)
-    image = Image.open(requests.get('https://sohowww.nascom.nasa.gov/'
-                                    'data/realtime/c2/1024/latest.jpg',
-                                    stream=True).raw)
-    left_column.image(image, caption='SOHO/LASCO-C2 near-real-time coronagraphic image')
-    image = Image.open(requests.get('https://sohowww.nascom.nasa.gov/'
-                                    'data/realtime/c3/1024/latest.jpg',
-                                    stream=True).raw)
-    right_column.image(image, caption='SOHO/LASCO-C3 near-real-time coronagraphic image')
+    c2, c3 = registry.get('lasco_c2'), registry.get('lasco_c3')
+    image_c2, image_c3 = images.load_images([c2.url_for(), c3.url_for()], ttl=c2.ttl)
+    _show_image(left_column, image_c2, caption='SOHO/LASCO-C2 near-real-time coronagraphic image')
+    _show_image(right_column, image_c3, caption='SOHO/LASCO-C3 near-real-time coronagraphic image')
     st.markdown(
         """
         ----------------------------------------------------------------------------------